@@ -0,0 +1,196 @@
+import asyncio
+import json
+import os
+import time
+
+from aiohttp import web
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from . import batch, config
+from .metrics import metrics
+from .validation import count_error, engine_error, flag, puzzle_error
+
+
+# seconds between two looks at the connection of a waiting request
+DISCONNECT_POLL = 0.1
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Disconnected(Exception):
+    pass
+
+
+class SolverPool:
+    def __init__(self, max_workers, queue_size):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(self.max_workers)
+        # a job holds a slot while a process works on it
+        self.slots = asyncio.Semaphore(self.max_workers)
+        self.capacity = self.max_workers + queue_size
+        self.jobs = 0
+
+    async def run(self, function, *args):
+        if self.jobs >= self.capacity:
+            raise QueueFull()
+
+        self.jobs += 1
+        try:
+            # a request cancelled while waiting here never reaches a process
+            await self.slots.acquire()
+
+            try:
+                future = self.submit(function, *args)
+            except BaseException:
+                self.slots.release()
+                raise
+
+            executor = self.executor
+
+            # the slot is free once the process is, even if the request went away before
+            loop = asyncio.get_running_loop()
+
+            def release(future):
+                try:
+                    loop.call_soon_threadsafe(self.slots.release)
+                except RuntimeError:
+                    # the loop is gone at shutdown
+                    pass
+
+            future.add_done_callback(release)
+            try:
+                return await asyncio.wrap_future(future)
+            except BrokenProcessPool:
+                self.replace(executor)
+                raise
+        finally:
+            self.jobs -= 1
+
+    def submit(self, function, *args):
+        try:
+            return self.executor.submit(function, *args)
+        except BrokenProcessPool:
+            # a process died during an earlier job: once more with a new pool
+            self.replace(self.executor)
+            return self.executor.submit(function, *args)
+
+    def replace(self, executor):
+        # a pool with a dead process takes no more work, the first job to see it starts a new one
+        if self.executor is executor:
+            executor.shutdown(wait=False)
+            self.executor = ProcessPoolExecutor(self.max_workers)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+async def until_disconnected(request, job):
+    # aiohttp does not cancel handlers whose client went away, so keep an eye on the connection:
+    # a job still waiting for a process is dropped, a running one is bounded by the solve timeout
+    task = asyncio.ensure_future(job)
+
+    while True:
+        done, pending = await asyncio.wait([task], timeout=DISCONNECT_POLL)
+        if done:
+            return task.result()
+
+        if request.transport is None or request.transport.is_closing():
+            task.cancel()
+            raise Disconnected()
+
+
+def json_response(status=200, **body):
+    return web.json_response(body, status=status)
+
+
+def bad_request(msg):
+    return json_response(400, code=400, error=msg)
+
+
+@web.middleware
+async def observe_request(request, handler):
+    start = time.perf_counter()
+    try:
+        return await handler(request)
+    finally:
+        route = request.match_info.route.resource
+        if route is not None:
+            metrics.observe_request(route.canonical, time.perf_counter() - start)
+
+
+async def solve(request):
+    # same contract as POST / of the wsgi app
+    content_type = 'application/json'
+    if request.headers.get('Content-Type') != content_type:
+        return bad_request("missing header: 'Content-Type: {}'".format(content_type))
+
+    try:
+        puzzle = json.loads(await request.text())
+    except ValueError:
+        puzzle = None
+
+    error = puzzle_error(puzzle)
+    if error is not None:
+        return bad_request('invalid request body: {}'.format(error))
+
+    engine = request.query.get('engine', 'crook')
+    error = engine_error(engine)
+    if error is not None:
+        return bad_request(error)
+
+    if 'count' in request.query:
+        limit = request.query['count']
+        error = count_error(limit, config.COUNT_MAX_LIMIT)
+
+        if error is not None:
+            return bad_request(error)
+
+        job = batch.count, puzzle, int(limit), engine
+    else:
+        job = batch.solve, puzzle, None, engine
+
+    try:
+        result = await until_disconnected(request, request.app['pool'].run(*job))
+    except QueueFull:
+        response = json_response(429, code=429, error='too many puzzles waiting, retry later')
+        response.headers['Retry-After'] = str(config.ASYNC_RETRY_AFTER)
+        return response
+    except Disconnected:
+        # nobody is left to read it
+        return json_response(499, code=499, error='client disconnected')
+    except BrokenProcessPool as e:
+        return json_response(500, code=500, error='solver failure: {}'.format(e))
+
+    result = batch.report(result, flag(request.query.get('stats')))
+    return json_response(result['code'], **result)
+
+
+async def metrics_text(request):
+    return web.Response(text=metrics.render(), headers={'Content-Type': 'text/plain; version=0.0.4'})
+
+
+async def start_pool(app):
+    app['pool'] = SolverPool(config.ASYNC_WORKERS, config.ASYNC_QUEUE_SIZE)
+
+
+async def stop_pool(app):
+    app['pool'].shutdown()
+
+
+def create_app():
+    app = web.Application(middlewares=[observe_request])
+    app.router.add_post('/', solve)
+    app.router.add_get('/metrics', metrics_text)
+    # the pool is created in the server process, after gunicorn has forked its workers
+    app.on_startup.append(start_pool)
+    app.on_cleanup.append(stop_pool)
+    return app
+
+
+# for gunicorn with --worker-class aiohttp.GunicornWebWorker
+app = create_app()
+
+if __name__ == '__main__':
+    web.run_app(app, port=5000)
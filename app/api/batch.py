@@ -0,0 +1,211 @@
+import json
+import math
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from . import config
+from .metrics import metrics
+from ..solver.cache import SolutionCache
+from ..solver.errors import TimeoutException
+from ..solver.solver import Solver, SolverIO
+from ..solver.stats import SolveStats
+from ..solver.store import SolutionStore
+
+# created on first use, so that every server worker forks its own pool
+_executor = None
+# shared by all server workers and solver processes on the host
+store = SolutionStore(config.STORE_PATH, config.STORE_MAX_SIZE) if config.STORE_PATH else None
+# one per process, shared by all requests it serves
+cache = SolutionCache(config.CACHE_SIZE, store=store) if config.CACHE_SIZE or store else None
+
+
+def executor(max_workers):
+    global _executor
+
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers)
+
+    return _executor
+
+
+def discard(pool):
+    # a pool with a dead process takes no more work: the next batch starts a new one
+    global _executor
+
+    if _executor is pool:
+        _executor = None
+
+    pool.shutdown(wait=False)
+
+
+def submit(pool, puzzles, indices, chunk_size, deadline, engine):
+    chunks = {}
+
+    for i in range(0, len(indices), chunk_size):
+        chunk = indices[i:i + chunk_size]
+        future = pool.submit(solve_chunk, [puzzles[index] for index in chunk], deadline, engine)
+        chunks[future] = chunk
+
+    return chunks
+
+
+def solve_deadline(deadline):
+    # the earlier of the given deadline and the one of a single puzzle
+    if config.SOLVE_TIMEOUT:
+        limit = time.monotonic() + config.SOLVE_TIMEOUT
+        deadline = limit if deadline is None else min(deadline, limit)
+
+    return deadline
+
+
+def parse(str_puzzle):
+    # a list of cells, or the compact format: one character per cell
+    if isinstance(str_puzzle, str):
+        return SolverIO.from_string(str_puzzle)
+
+    return SolverIO.from_list(str_puzzle)
+
+
+def answer(str_puzzle, board):
+    # a solution in the format of its puzzle
+    if isinstance(str_puzzle, str):
+        return SolverIO.to_string(board)
+
+    return SolverIO.to_list(board)
+
+
+def solve(str_puzzle, deadline=None, engine='crook'):
+    puzzle = parse(str_puzzle)
+    size = SolverIO.board_size(str_puzzle)
+    stats = SolveStats()
+    max_nodes = config.SOLVE_MAX_NODES
+    deadline = solve_deadline(deadline)
+
+    try:
+        # the cache only knows 9x9 boards
+        if cache is not None and size == 9:
+            board = cache.solve(puzzle, stats, deadline, max_nodes, engine, config.SOLVE_PORTFOLIO)
+        else:
+            solver = Solver(puzzle, stats=stats, size=size, engine=engine, portfolio=config.SOLVE_PORTFOLIO)
+            board = solver.get_board() if solver.solve(deadline, max_nodes) else None
+    except TimeoutException as e:
+        return dict(code=504, error='solver limit exceeded: {}'.format(e.message), stats=stats.as_dict())
+
+    # no stats if the answer came from the cache
+    stats = stats.as_dict() if stats.solves else None
+
+    if board is None:
+        return dict(code=200, result='no solution', stats=stats)
+
+    return dict(code=200, result=answer(str_puzzle, board), stats=stats)
+
+
+def count(str_puzzle, limit, engine='crook'):
+    # the cache only knows one solution per puzzle, so counting always solves
+    solver = Solver(parse(str_puzzle), size=SolverIO.board_size(str_puzzle), engine=engine)
+
+    try:
+        count, solutions = solver.count_solutions(limit, solve_deadline(None), config.SOLVE_MAX_NODES)
+    except TimeoutException as e:
+        return dict(code=504, error='solver limit exceeded: {}'.format(e.message), stats=solver.stats.as_dict())
+
+    solutions = [answer(str_puzzle, solution) for solution in solutions]
+    return dict(code=200, count=count, solutions=solutions, stats=solver.stats.as_dict())
+
+
+def report(result, with_stats):
+    # adds the stats of a result to the metrics, they stay in the result only if asked for
+    stats = result.pop('stats', None)
+    metrics.observe_result(result, stats)
+
+    if with_stats:
+        result['stats'] = stats
+
+    return result
+
+
+def solve_chunk(str_puzzles, deadline=None, engine='crook'):
+    # deadline is shared with the process that submitted the chunk: time.monotonic is system-wide
+    return [solve(str_puzzle, deadline, engine) for str_puzzle in str_puzzles]
+
+
+def parse_ndjson(body):
+    puzzles = []
+
+    for line in body.splitlines():
+        line = line.strip()
+
+        if not line:
+            continue
+
+        if line[0] not in '["':
+            # a puzzle in the compact format needs no quotes
+            puzzles.append(line)
+            continue
+
+        try:
+            puzzles.append(json.loads(line))
+        except ValueError:
+            # reported as a bad puzzle by validation
+            puzzles.append(line)
+
+    return puzzles
+
+
+def run(puzzles, errors, max_workers, timeout, with_stats=False, engine='crook'):
+    # yields (index, result) pairs as soon as each puzzle is done
+    deadline = time.monotonic() + timeout
+
+    for index, error in enumerate(errors):
+        if error is not None:
+            yield index, report(dict(code=400, error=error), with_stats)
+
+    indices = [index for index, error in enumerate(errors) if error is None]
+    if not indices:
+        return
+
+    max_workers = max_workers or os.cpu_count() or 1
+    pool = executor(max_workers)
+    # a few chunks per process keeps them all busy until the end of the batch
+    chunk_size = math.ceil(len(indices) / (max_workers * 4))
+
+    try:
+        chunks = submit(pool, puzzles, indices, chunk_size, deadline, engine)
+    except BrokenProcessPool:
+        # a process died in an earlier batch: once more with a new pool
+        discard(pool)
+        pool = executor(max_workers)
+        chunks = submit(pool, puzzles, indices, chunk_size, deadline, engine)
+
+    try:
+        for future in as_completed(chunks, timeout=max(0, deadline - time.monotonic())):
+            chunk = chunks.pop(future)
+
+            try:
+                results = future.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    discard(pool)
+
+                results = [dict(code=500, error='solver failure: {}'.format(e)) for index in chunk]
+
+            for index, result in zip(chunk, results):
+                yield index, report(result, with_stats)
+
+    except TimeoutError:
+        for future, chunk in chunks.items():
+            future.cancel()
+
+            for index in chunk:
+                yield index, report(dict(code=504, error='batch time limit exceeded'), with_stats)
+
+
+def run_ordered(puzzles, errors, max_workers, timeout, with_stats=False, engine='crook'):
+    results = [None] * len(puzzles)
+
+    for index, result in run(puzzles, errors, max_workers, timeout, with_stats, engine):
+        results[index] = result
+
+    return results
@@ -0,0 +1,28 @@
+import os
+
+# maximum number of puzzles in one batch request
+BATCH_MAX_SIZE = int(os.environ.get('SUDOKU_BATCH_MAX_SIZE', '1000'))
+# seconds a batch may take before its unfinished puzzles are reported as timed out
+BATCH_TIMEOUT = float(os.environ.get('SUDOKU_BATCH_TIMEOUT', '30'))
+# solver processes per server worker (default: number of CPUs)
+BATCH_WORKERS = int(os.environ.get('SUDOKU_BATCH_WORKERS', '0')) or None
+# solutions kept by the symmetry-aware cache of each process (0 disables it)
+CACHE_SIZE = int(os.environ.get('SUDOKU_CACHE_SIZE', '10000'))
+# sqlite file with solutions shared by all processes (unset disables it)
+STORE_PATH = os.environ.get('SUDOKU_STORE')
+# solutions kept in the store, oldest are evicted first
+STORE_MAX_SIZE = int(os.environ.get('SUDOKU_STORE_MAX_SIZE', '1000000'))
+# seconds a single puzzle may take before it is reported as timed out (0 disables it)
+SOLVE_TIMEOUT = float(os.environ.get('SUDOKU_SOLVE_TIMEOUT', '10'))
+# search nodes a single puzzle may take before it is reported as timed out (0 disables it)
+SOLVE_MAX_NODES = int(os.environ.get('SUDOKU_SOLVE_MAX_NODES', '0')) or None
+# parallel runs of the solver for a puzzle the plain search does not solve quickly (0 disables them)
+SOLVE_PORTFOLIO = int(os.environ.get('SUDOKU_SOLVE_PORTFOLIO', '0'))
+# largest number of solutions a request may ask to count
+COUNT_MAX_LIMIT = int(os.environ.get('SUDOKU_COUNT_MAX_LIMIT', '100'))
+# solver processes of the asyncio server (default: number of CPUs)
+ASYNC_WORKERS = int(os.environ.get('SUDOKU_ASYNC_WORKERS', '0')) or None
+# puzzles the asyncio server keeps waiting for a solver process before it answers 429
+ASYNC_QUEUE_SIZE = int(os.environ.get('SUDOKU_ASYNC_QUEUE_SIZE', '64'))
+# seconds a client should wait after a 429
+ASYNC_RETRY_AFTER = int(os.environ.get('SUDOKU_ASYNC_RETRY_AFTER', '1'))
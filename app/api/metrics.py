@@ -0,0 +1,140 @@
+import threading
+
+from bisect import bisect_left
+
+# upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+# solver counters added up over all solves
+COUNTERS = ('solves', 'forced_numbers', 'markup_passes', 'cross_outs', 'search_paths',
+            'nodes', 'violations', 'backtracks', 'backjumps', 'nogood_hits')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+
+    return '{' + ','.join('{}="{}"'.format(key, val) for key, val in labels) + '}'
+
+
+def _number(val):
+    return repr(float(val)) if isinstance(val, float) else str(val)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, val):
+        self.counts[bisect_left(self.buckets, val)] += 1
+        self.sum += val
+        self.count += 1
+
+    def render(self, name, labels=()):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            le = bound if bound == '+Inf' else _number(bound)
+            lines.append('{}_bucket{} {}'.format(name, _labels(labels + (('le', le),)), cumulative))
+
+        lines.append('{}_sum{} {}'.format(name, _labels(labels), _number(self.sum)))
+        lines.append('{}_count{} {}'.format(name, _labels(labels), self.count))
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.puzzles = {}
+        self.cached = 0
+        self.solve_seconds = Histogram(LATENCY_BUCKETS)
+        self.depth = Histogram(DEPTH_BUCKETS)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.preemptive_sets = {}
+        self.phase_seconds = {}
+
+    def observe_request(self, endpoint, seconds):
+        with self.lock:
+            if endpoint not in self.requests:
+                self.requests[endpoint] = Histogram(LATENCY_BUCKETS)
+
+            self.requests[endpoint].observe(seconds)
+
+    def observe_result(self, result, stats):
+        # stats is None for errors and for puzzles answered from the cache
+        with self.lock:
+            code = result['code']
+            self.puzzles[code] = self.puzzles.get(code, 0) + 1
+
+            if stats is None:
+                self.cached += code == 200
+                return
+
+            for name in COUNTERS:
+                self.counters[name] += stats[name]
+
+            for size, count in stats['preemptive_sets'].items():
+                self.preemptive_sets[size] = self.preemptive_sets.get(size, 0) + count
+
+            for phase, seconds in stats['seconds'].items():
+                self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+
+            self.solve_seconds.observe(sum(stats['seconds'].values()))
+            self.depth.observe(stats['max_depth'])
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = []
+
+        with self.lock:
+            lines.append('# HELP sudoku_request_duration_seconds Request latency by endpoint.')
+            lines.append('# TYPE sudoku_request_duration_seconds histogram')
+            for endpoint in sorted(self.requests):
+                lines.extend(self.requests[endpoint].render(
+                    'sudoku_request_duration_seconds', (('endpoint', endpoint),)))
+
+            lines.append('# HELP sudoku_puzzles_total Puzzles answered by response code.')
+            lines.append('# TYPE sudoku_puzzles_total counter')
+            for code in sorted(self.puzzles):
+                lines.append('sudoku_puzzles_total{} {}'.format(_labels((('code', code),)), self.puzzles[code]))
+
+            lines.append('# HELP sudoku_cached_puzzles_total Puzzles answered without solving them.')
+            lines.append('# TYPE sudoku_cached_puzzles_total counter')
+            lines.append('sudoku_cached_puzzles_total {}'.format(self.cached))
+
+            lines.append('# HELP sudoku_solve_duration_seconds Solver wall time per puzzle.')
+            lines.append('# TYPE sudoku_solve_duration_seconds histogram')
+            lines.extend(self.solve_seconds.render('sudoku_solve_duration_seconds'))
+
+            lines.append('# HELP sudoku_solver_max_depth Deepest search path per puzzle.')
+            lines.append('# TYPE sudoku_solver_max_depth histogram')
+            lines.extend(self.depth.render('sudoku_solver_max_depth'))
+
+            for name in COUNTERS:
+                metric = 'sudoku_solver_{}_total'.format(name)
+                lines.append('# TYPE {} counter'.format(metric))
+                lines.append('{} {}'.format(metric, self.counters[name]))
+
+            lines.append('# HELP sudoku_solver_preemptive_sets_total '
+                         'Preemptive sets by number of cells (naked) or values (hidden).')
+            lines.append('# TYPE sudoku_solver_preemptive_sets_total counter')
+            for size in sorted(self.preemptive_sets, key=int):
+                lines.append('sudoku_solver_preemptive_sets_total{} {}'.format(
+                    _labels((('size', size),)), self.preemptive_sets[size]))
+
+            lines.append('# HELP sudoku_solver_phase_seconds_total Solver wall time by phase.')
+            lines.append('# TYPE sudoku_solver_phase_seconds_total counter')
+            for phase in sorted(self.phase_seconds):
+                lines.append('sudoku_solver_phase_seconds_total{} {}'.format(
+                    _labels((('phase', phase),)), _number(self.phase_seconds[phase])))
+
+        return '\n'.join(lines) + '\n'
+
+
+# one per server worker
+metrics = Metrics()
@@ -0,0 +1,49 @@
+from ..solver.solver import BOARD_SIZES, CHAR_VALUES, ENGINES, SolverIO
+
+LENGTHS = tuple(size * size for size in BOARD_SIZES)
+# query values that turn a flag like ?stats=1 on, anything else leaves it off
+FLAG_VALUES = frozenset(['1', 'true', 'yes'])
+# the items of a puzzle list: '' for an empty cell or a digit of the board
+LIST_ITEMS = {size: frozenset([''] + [str(val) for val in range(1, size + 1)]) for size in BOARD_SIZES}
+# the characters of a puzzle string
+STRING_CHARS = {size: frozenset(char for char, val in CHAR_VALUES.items() if val <= size) for size in BOARD_SIZES}
+
+
+def puzzle_error(puzzle):
+    # a list with one string per cell, or the compact format: a string with one character per cell
+    if isinstance(puzzle, str):
+        return _string_error(puzzle)
+
+    if not isinstance(puzzle, list):
+        return 'not a list or a string'
+
+    if len(puzzle) not in LENGTHS:
+        return 'expected {} list items, found {}'.format(' or '.join(map(str, LENGTHS)), len(puzzle))
+
+    items = LIST_ITEMS[SolverIO.board_size(puzzle)]
+    for item in puzzle:
+        if not (isinstance(item, str) and item in items):
+            return 'bad list item: {}'.format(item)
+
+
+def _string_error(puzzle):
+    if len(puzzle) not in LENGTHS:
+        return 'expected {} characters, found {}'.format(' or '.join(map(str, LENGTHS)), len(puzzle))
+
+    chars = STRING_CHARS[SolverIO.board_size(puzzle)]
+    if not chars.issuperset(puzzle):
+        return 'bad character: {!r}'.format(next(char for char in puzzle if char not in chars))
+
+
+def count_error(limit, max_limit):
+    if not (limit.isdecimal() and 1 <= int(limit) <= max_limit):
+        return 'invalid count: expected 1 to {}, found {}'.format(max_limit, limit)
+
+
+def engine_error(engine):
+    if engine not in ENGINES:
+        return 'invalid engine: expected {}, found {}'.format(' or '.join(ENGINES), engine)
+
+
+def flag(value):
+    return value is not None and value.lower() in FLAG_VALUES
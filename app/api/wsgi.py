@@ -1,40 +1,58 @@
-import re
+import json
+import time
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from functools import wraps
-from ..solver.solver import Solver, SolverIO
+from . import batch, config
+from .metrics import metrics
+from .validation import count_error, engine_error, flag, puzzle_error
 
 app = Flask(__name__)
+app.config.from_object(config)
+
+
+@app.before_request
+def start_timer():
+    g.start = time.perf_counter()
+
+
+@app.after_request
+def observe_request(response):
+    if request.url_rule is not None:
+        metrics.observe_request(request.url_rule.rule, time.perf_counter() - g.start)
+
+    return response
+
+
+def wants_stats():
+    return flag(request.args.get('stats'))
 
 
 def bad_request(msg):
     return jsonify(code=400, error=msg), 400
 
 
-def require_header(route):
-    @wraps(route)
-    def check_header(*args, **kwargs):
-        if request.headers.get('Content-Type') == 'application/json':
-            return route(*args, **kwargs)
-        return bad_request("missing header: 'Content-Type: application/json'")
+def require_header(*content_types):
+    def decorator(route):
+        @wraps(route)
+        def check_header(*args, **kwargs):
+            if request.headers.get('Content-Type') in content_types:
+                return route(*args, **kwargs)
+            return bad_request("missing header: 'Content-Type: {}'".format(' | '.join(content_types)))
 
-    return check_header
+        return check_header
+
+    return decorator
 
 
 def validate_data(route):
     @wraps(route)
     def check_data(*args, **kwargs):
         base_msg = 'invalid request body'
+        error = puzzle_error(request.json)
 
-        if not isinstance(request.json, list):
-            return bad_request('{}: not a list'.format(base_msg))
-
-        if len(request.json) != 81:
-            return bad_request('{}: expected 81 list items, found {}'.format(base_msg, len(request.json)))
-
-        for i in range(len(request.json)):
-            if not (isinstance(request.json[i], str) and re.search('^$|^[1-9]$', request.json[i])):
-                return bad_request('{}: bad list item: {}'.format(base_msg, request.json[i]))
+        if error is not None:
+            return bad_request('{}: {}'.format(base_msg, error))
 
         return route(*args, **kwargs)
 
@@ -42,17 +60,81 @@ def validate_data(route):
 
 
 @app.route('/', methods=['POST'])
-@require_header
+@require_header('application/json')
 @validate_data
 def solve():
-    puzzle = SolverIO.from_list(request.json)
-    solver = Solver(puzzle)
+    engine = request.args.get('engine', 'crook')
+    error = engine_error(engine)
+
+    if error is not None:
+        return bad_request(error)
+
+    if 'count' in request.args:
+        limit = request.args.get('count')
+        error = count_error(limit, app.config['COUNT_MAX_LIMIT'])
+
+        if error is not None:
+            return bad_request(error)
+
+        result = batch.report(batch.count(request.json, int(limit), engine), wants_stats())
+    else:
+        result = batch.report(batch.solve(request.json, engine=engine), wants_stats())
+
+    return jsonify(**result), result['code']
+
+
+@app.route('/cache', methods=['GET'])
+def cache_stats():
+    if batch.cache is None:
+        return jsonify(code=200, result=None)
+
+    return jsonify(code=200, result=batch.cache.stats())
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_text():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/batch', methods=['POST'])
+@require_header('application/json', 'application/x-ndjson')
+def solve_batch():
+    base_msg = 'invalid request body'
+
+    if request.headers.get('Content-Type') == 'application/x-ndjson':
+        puzzles = batch.parse_ndjson(request.get_data(as_text=True))
+    elif isinstance(request.json, list):
+        puzzles = request.json
+    else:
+        return bad_request('{}: not a list'.format(base_msg))
+
+    max_size = app.config['BATCH_MAX_SIZE']
+    if len(puzzles) > max_size:
+        msg = '{}: expected at most {} puzzles, found {}'.format(base_msg, max_size, len(puzzles))
+        return jsonify(code=413, error=msg), 413
+
+    engine = request.args.get('engine', 'crook')
+    error = engine_error(engine)
+
+    if error is not None:
+        return bad_request(error)
+
+    errors = [puzzle_error(puzzle) for puzzle in puzzles]
+    errors = [None if error is None else '{}: {}'.format(base_msg, error) for error in errors]
+    max_workers = app.config['BATCH_WORKERS']
+    timeout = app.config['BATCH_TIMEOUT']
+    with_stats = wants_stats()
+
+    if flag(request.args.get('stream')):
+        # one line per puzzle, in the order they are solved
+        def stream():
+            for index, result in batch.run(puzzles, errors, max_workers, timeout, with_stats, engine):
+                yield json.dumps(dict(result, index=index)) + '\n'
 
-    if not solver.solve():
-        return jsonify(code=200, result='no solution')
+        return Response(stream(), mimetype='application/x-ndjson')
 
-    solution = SolverIO.to_list(solver.get_board())
-    return jsonify(code=200, result=solution)
+    results = batch.run_ordered(puzzles, errors, max_workers, timeout, with_stats, engine)
+    return jsonify(code=200, results=results)
 
 
 if __name__ == '__main__':
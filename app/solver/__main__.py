@@ -1,16 +1,98 @@
+import argparse
 import fileinput
+import sys
 
-from .solver import Solver, SolverIO
+from .branching import STRATEGIES
+from .solver import ENGINES, Solver, SolverIO
+from .stream import solve_all, format_count, format_result
 
-filein = fileinput.input()
-cells = SolverIO.from_file(filein)
-solver = Solver(cells)
+parser = argparse.ArgumentParser(prog='python3 -m app.solver')
+parser.add_argument('files', nargs='*', help='puzzle file (default: stdin)')
+parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='mrv',
+                    help='branching strategy of the backtrack search')
+parser.add_argument('--engine', choices=ENGINES, default='crook',
+                    help='crook: markup, preemptive sets and search; dlx: Dancing Links (default: crook)')
+parser.add_argument('--portfolio', type=int, default=0, metavar='RUNS',
+                    help='solve a puzzle the plain search does not solve quickly with RUNS parallel runs')
+parser.add_argument('--stream', action='store_true',
+                    help='solve every puzzle of the input, one result per line')
+parser.add_argument('--jobs', type=int, default=1,
+                    help='solver processes in stream mode (default: 1)')
+parser.add_argument('--chunk-size', type=int, default=64,
+                    help='puzzles sent to a solver process at a time (default: 64)')
+parser.add_argument('--format', choices=['line', 'json'], default='line',
+                    help='stream output: the solution, or a JSON object per puzzle')
+parser.add_argument('--count', type=int, metavar='LIMIT',
+                    help='count the solutions of each puzzle, up to LIMIT')
+parser.add_argument('--vectorized', action='store_true',
+                    help='in stream mode, propagate each chunk with numpy before searching')
+args = parser.parse_args()
+
+if args.jobs < 1 or args.chunk_size < 1:
+    parser.error('--jobs and --chunk-size must be at least 1')
+
+if args.count is not None and args.count < 1:
+    parser.error('--count must be at least 1')
+
+if args.portfolio < 0:
+    parser.error('--portfolio must be at least 0')
+
+if args.portfolio and (args.stream or args.jobs > 1 or args.vectorized):
+    parser.error('--portfolio only solves a single puzzle')
+
+if args.portfolio and args.count is not None:
+    parser.error('--portfolio does not count solutions')
+
+if args.vectorized:
+    from .vectorized import available
+
+    if not available():
+        parser.error('--vectorized needs numpy')
+
+    if args.count is not None:
+        parser.error('--vectorized does not count solutions')
+
+if args.stream or args.jobs > 1 or args.vectorized:
+    # a malformed puzzle is reported in its place, the others are still solved
+    str_puzzles = SolverIO.iter_strings(fileinput.input(args.files), errors=True)
+    formatter = format_result if args.count is None else format_count
+
+    for result in solve_all(str_puzzles, args.strategy, args.jobs, args.chunk_size, args.count, args.vectorized,
+                            args.engine, errors=True):
+        if isinstance(result, ValueError) and args.format == 'line':
+            sys.stderr.write('error: {}\n'.format(result.args[0]))
+
+        sys.stdout.write(formatter(result, args.format) + '\n')
+
+    sys.exit()
+
+try:
+    str_puzzle = next(SolverIO.iter_strings(fileinput.input(args.files)), None)
+    if str_puzzle is None:
+        sys.exit('error: no puzzle')
+
+    cells = SolverIO.from_string(str_puzzle)
+except ValueError as e:
+    sys.exit('error: {}'.format(e))
+
+solver = Solver(cells, strategy=args.strategy, size=SolverIO.board_size(str_puzzle), engine=args.engine,
+                portfolio=args.portfolio)
 
 print("puzzle")
 print(solver)
 
-if solver.solve():
+if args.count is not None:
+    count, solutions = solver.count_solutions(args.count)
+
+    for solution in solutions:
+        print("solution")
+        print(SolverIO.to_string(solution))
+
+    print("solutions: {}{}".format(count, '+' if count == args.count else ''))
+elif solver.solve():
     print("solution")
     print(solver)
 else:
     print("no solution")
+
+print("nodes: {}".format(solver.nodes))
@@ -1,213 +1,235 @@
-import bisect
-import copy
-import math
+from .errors import NoSolutionException
 
-from .errors import ViolationException, NoSolutionException
+# learned nogoods kept per solve, the oldest are dropped first
+NOGOOD_CACHE_SIZE = 256
+# nogoods of more choices are not learned: they hardly ever come back
+MAX_NOGOOD_SIZE = 8
 
 
 class BacktrackSearch:
-    def __init__(self, board, markup, preemptive_set):
+    def __init__(self, board, markup, strategy, observer=None):
         self.board = board
         self.markup = markup
-        self.preemptive_set = preemptive_set
-        self.children_cells = []
-        self.search_path = None
+        self.strategy = strategy
+        self.peers = board.topology.peers
+        self.search_paths = []
         self.violation_occurred = False
+        self.nodes = 0
+        # the choices made, (cell, candidate bit), by the level of their search path
+        self.decided = {}
+        # learned nogoods: sets of choices that cannot all be made, oldest first, and the
+        # nogoods each choice is part of
+        self.nogoods = {}
+        self.watches = {}
+        # counters for SolveStats
+        self.paths_created = 0
+        self.violations = 0
+        self.backtracks = 0
+        self.backjumps = 0
+        self.nogood_hits = 0
+        self.max_depth = 0
+        # an Observer, or None: events are only reported with one attached
+        self.observer = observer
 
     def position(self):
-        if not self.search_path_exists():
-            preemptive_pair = self.preemptive_set.find(pair=True)
-            cell = self._next_preemptive_cell(
-                preemptive_pair, self.children_cells
-            )
-
-            if cell is None:
-                cell = self._next_empty_cell(self.children_cells)
-                self.children_cells.append(cell)
-            else:
-                self.children_cells.extend(preemptive_pair.cells)
-
-            parent_cells = [cell]
-            self.search_path = SearchPath(
-                self.board, self.markup, cell, parent_cells)
-
-        elif not self.violation_occurred:
-            preemptive_pair = self.preemptive_set.find(pair=True)
-            cell = self._next_preemptive_cell(
-                preemptive_pair,
-                self.search_path.parent_cells + self.search_path.children_cells
-            )
-
-            if cell is None:
-                cell = self._next_empty_cell(
-                    self.search_path.parent_cells + self.search_path.children_cells
-                )
-                self.search_path.children_cells.append(cell)
-            else:
-                self.search_path.children_cells.extend(preemptive_pair.cells)
+        if not self.violation_occurred:
+            cell = self.strategy.next_cell()
+            self.search_paths.append(SearchPath(
+                cell, self.board.masks.bits[self.board[cell]], self.board.checkpoint(), self.board.reasons[cell]
+            ))
+            self.paths_created += 1
+            self.max_depth = max(self.max_depth, len(self.search_paths))
 
-            parent_cells = copy.copy(self.search_path.parent_cells)
-            parent_cells.append(cell)
-            self.search_path.child = SearchPath(
-                self.board, self.markup, cell, parent_cells, self.search_path
-            )
-            self.search_path = self.search_path.child
+            if self.observer is not None:
+                self.observer.path_opened(cell, self.board[cell])
 
         else:
             self.violation_occurred = False
 
     def search(self):
-        self.search_path.search()
-
-    def delete_search_path(self):
-        self.search_path.index += 1
-
-        while self.search_path_exists() and self.search_path.dead_end():
-            self.search_path.undo_crossouts()
-            self.search_path = self.search_path.delete()
+        self.nodes += 1
+        level = len(self.search_paths)
+        search_path = self.search_paths[-1]
+        k = search_path.cell
+        choice = search_path.choices[search_path.index]
+        self.decided[k, choice] = level
+
+        conflict = self._nogood_conflict((k, choice))
+        if conflict:
+            # a learned nogood: no need to propagate the choice to see it fail
+            self.nogood_hits += 1
+            self._violation(k, conflict)
+            return
+
+        removed = self.board[k] & ~choice
+
+        if removed:
+            self.board.remove(k, removed, 1 << level)
+
+            if self.observer is not None:
+                self.observer.cross_out(k, removed)
+
+            if self.board.dead_units:
+                # the choice took the last place of a value: try the next one
+                self._violation(k, self._conflict(k))
+                return
+
+        self.markup.cell_enqueue(k)
+
+    def delete_search_path(self, conflict=None):
+        # conflict holds the levels of the choices the current one failed with, bit i for the
+        # i-th search path; None if the failure may come from any of them
+        search_paths = self.search_paths
+
+        if conflict is None:
+            conflict = (1 << (len(search_paths) + 1)) - 2
+
+        while True:
+            if not conflict:
+                raise NoSolutionException('contradiction without a choice')
+
+            level = conflict.bit_length() - 1
+
+            # the choices after the last one in conflict play no part in it: jump back over them
+            while len(search_paths) > level:
+                self._drop(search_paths[-1])
+                self.backjumps += 1
+
+            search_path = search_paths[-1]
+            del self.decided[search_path.cell, search_path.choices[search_path.index]]
+            search_path.conflicts |= conflict ^ (1 << level)
+            search_path.index += 1
+
+            if not search_path.dead_end():
+                break
+
+            # every choice failed: for the conflicts they ran into, and for what left the cell
+            # with these choices only
+            self._drop(search_path)
+            self.backtracks += 1
+            conflict = search_path.conflicts | search_path.reasons
+            self._learn(conflict)
+
+        self.board.undo(search_path.checkpoint)
+        # cells queued for markup were solved on the path just undone
+        self.markup.queue.clear()
+        # the board is back to where the search branched, with no dirty units
+        self.board.dirty.clear()
+
+    def _drop(self, search_path):
+        self.search_paths.pop()
+
+        if not search_path.dead_end():
+            self.decided.pop((search_path.cell, search_path.choices[search_path.index]), None)
+
+        if self.observer is not None:
+            self.observer.backtrack(search_path.cell)
+
+    def violation_check(self, k):
+        # True if removing candidates of cell k led to a violation: the search path is then
+        # already deleted and callers must stop propagating
+        if self.board.dead_units:
+            self._violation(k, self._conflict(k))
+            return True
+
+        p = self._peer_violation(k)
+        if p is not None:
+            self._violation(k, self.board.reasons[k] | self.board.reasons[p])
+            return True
 
-        if self.search_path_exists():
-            self.search_path.undo_crossouts()
+        return False
 
-    def crossout_append(self, row, col, val):
-        self.search_path.crossout_append(row, col, val)
+    def _violation(self, k, conflict):
+        if self.observer is not None:
+            self.observer.violation(k)
 
-    def violation_check(self, row, col):
-        self.violation_occurred = self._row_violation(row, col) or \
-            self._col_violation(row, col) or \
-            self._box_violation(row, col)
+        # before any choice, a contradiction means the puzzle itself has no solution
+        if not self.search_paths:
+            raise NoSolutionException('contradiction without a search path')
 
-        if self.violation_occurred:
-            self.delete_search_path()
-            raise ViolationException(row, col)
+        self.violation_occurred = True
+        self.violations += 1
+        self.delete_search_path(conflict)
 
-    def search_path_exists(self):
-        return self.search_path is not None
+    def _conflict(self, k):
+        # the choices that left a value without a place in a unit of cell k
+        unit = self.board.dead_unit(k)
 
-    @staticmethod
-    def _next_preemptive_cell(preemptive_pair, search_cells):
-        if preemptive_pair is None:
+        if unit is None:
             return None
 
-        cell = preemptive_pair.cells[0]
-        if cell in search_cells:
-            return None
+        return self.board.unit_reasons(unit)
 
-        return cell
+    def _learn(self, conflict):
+        # the current choices of the levels in conflict cannot be made together
+        if bin(conflict).count('1') > MAX_NOGOOD_SIZE:
+            return
 
-    def _next_empty_cell(self, search_cells):
-        min_markup_len = math.inf
-        min_cell = None
+        nogood = frozenset(
+            (search_path.cell, search_path.choices[search_path.index])
+            for level, search_path in enumerate(self.search_paths, 1) if conflict >> level & 1
+        )
 
-        for row in range(9):
-            for col in range(9):
-                cell = row, col
-                markup = self.board[9 * row + col]
-                if 1 < len(markup) < min_markup_len and cell not in search_cells:
-                    min_cell = cell
+        if nogood in self.nogoods:
+            return
 
-        if min_cell is None:
-            raise NoSolutionException
+        self.nogoods[nogood] = None
+        for choice in nogood:
+            self.watches.setdefault(choice, set()).add(nogood)
 
-        return min_cell
+        if len(self.nogoods) > NOGOOD_CACHE_SIZE:
+            oldest = next(iter(self.nogoods))
+            del self.nogoods[oldest]
 
-    def _new_search_path(self, cell, parent_cells):
-        self.search_path = SearchPath(
-            self.board, self.markup, cell, parent_cells)
+            for choice in oldest:
+                self.watches[choice].discard(oldest)
 
-    def _child_add(self, cell, parent_cells):
-        self.search_path.child = SearchPath(
-            self.board,
-            self.markup,
-            cell,
-            parent_cells,
-            self.search_path
-        )
-        self.search_path = self.search_path.child
+    def _nogood_conflict(self, choice):
+        # the levels of a learned nogood the choice completes, 0 if there is none
+        decided = self.decided
 
-    def _row_violation(self, row, col):
-        val = self.board[9 * row + col][0]
+        for nogood in self.watches.get(choice, ()):
+            conflict = 0
 
-        for c in range(9):
-            markup = self.board[9 * row + c]
-            if c != col and len(markup) == 1 and val == markup[0]:
-                return True
+            for other in nogood:
+                level = decided.get(other)
+                if level is None:
+                    break
 
-        return False
+                conflict |= 1 << level
+            else:
+                return conflict
 
-    def _col_violation(self, row, col):
-        val = self.board[9 * row + col][0]
+        return 0
 
-        for r in range(9):
-            markup = self.board[9 * r + col]
-            if r != row and len(markup) == 1 and val == markup[0]:
-                return True
+    def search_path_exists(self):
+        return len(self.search_paths) > 0
 
-        return False
+    def _peer_violation(self, k):
+        # a peer solved with the same value as cell k, None if there is none
+        cells = self.board.cells
+        val = cells[k]
 
-    def _box_violation(self, row, col):
-        val = self.board[9 * row + col][0]
-        # get index of upper-left cell
-        i = (row // 3) * 3
-        j = (col // 3) * 3
-        # iterate over box
-        for r in range(i, i + 3):
-            for c in range(j, j + 3):
-                markup = self.board[9 * r + c]
-                if r != row and c != col and len(markup) == 1 and val == markup[0]:
-                    return True
+        for p in self.peers[k]:
+            if cells[p] == val:
+                return p
 
-        return False
+        return None
 
 
 class SearchPath:
-    def __init__(self, board, markup, cell, parent_cells, parent=None):
-        self.board = board
-        self.markup = markup
-        self.row, self.col = cell[0], cell[1]
-        self.cell_markup = self.board[9 * self.row + self.col]
-        self.cell_markup_len = len(self.cell_markup)
+    __slots__ = ('cell', 'choices', 'index', 'checkpoint', 'reasons', 'conflicts')
+
+    def __init__(self, cell, choices, checkpoint, reasons):
         self.cell = cell
+        self.choices = choices
         self.index = 0
-        self.crossouts = dict()
-        self.parent = parent
-        self.child = None
-        self.parent_cells = parent_cells
-        self.children_cells = []
-
-    def search(self):
-        for i in range(0, len(self.cell_markup)):
-            if i != self.index:
-                self.crossout_append(self.row, self.col, self.cell_markup[i])
-
-        search_choice = self.cell_markup[self.index]
-        self.cell_markup.clear()
-        self.cell_markup.append(search_choice)
-        self.markup.cell_enqueue(self.row, self.col)
-
-    def undo_crossouts(self):
-        for c in self.crossouts:
-            row = c[0]
-            col = c[1]
-            values = self.crossouts[c]
-            markup = self.board[9 * row + col]
-
-            for val in values:
-                bisect.insort_left(markup, val)
-
-        self.crossouts.clear()
-
-    def delete(self):
-        # gets called only when this search path is finished
-        self.parent.index += 1
-        self.parent.child = None
-        return self.parent
+        # length of the board trail before the first choice was made
+        self.checkpoint = checkpoint
+        # the earlier choices that removed the other candidates of the cell, and the ones the
+        # choices tried so far failed with
+        self.reasons = reasons
+        self.conflicts = 0
 
     def dead_end(self):
-        return self.index >= self.cell_markup_len
-
-    def crossout_append(self, row, col, val):
-        if self.crossouts.get((row, col)) is None:
-            self.crossouts[(row, col)] = [val]
-        else:
-            self.crossouts[(row, col)].append(val)
+        return self.index >= len(self.choices)
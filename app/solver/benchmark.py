@@ -0,0 +1,310 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from .backtrack_search import BacktrackSearch
+from .branching import STRATEGIES
+from .canonical import random_transform
+from .dlx import DancingLinks
+from .generate import GRADES, generate_all
+from .markup import Markup
+from .preemptive_set import PreemptiveSetProxy
+from .solver import ENGINES, Solver, SolverIO
+
+PUZZLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'puzzles')
+# one file per grade: python3 -m app.solver.generate 200 --grade GRADE, seed 0
+GRADED_DIR = os.path.join(PUZZLES_DIR, 'graded')
+
+# the phases of Solver.solve, timed by wrapping these methods
+PHASES = (
+    ('forced_numbers', Markup, 'forced_numbers'),
+    ('markup', Markup, 'markup'),
+    ('find_and_crossout', PreemptiveSetProxy, 'find_and_crossout'),
+    ('position', BacktrackSearch, 'position'),
+    ('search', BacktrackSearch, 'search'),
+    ('dlx_search', DancingLinks, 'search'),
+)
+
+# generated corpora to show how solving scales with the board size: the size and
+# the share of cells given as clues
+SCALING = (
+    (9, 0.55),
+    (16, 0.55),
+    (25, 0.55),
+)
+
+PERCENTILES = (50, 90, 99)
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.seconds = {name: 0.0 for name, cls, method in PHASES}
+        self.calls = {name: 0 for name, cls, method in PHASES}
+        self._originals = []
+        self._active = False
+
+    def __enter__(self):
+        for name, cls, method in PHASES:
+            original = getattr(cls, method)
+            self._originals.append((cls, method, original))
+            setattr(cls, method, self._timed(name, original))
+
+        return self
+
+    def __exit__(self, *exc_info):
+        for cls, method, original in self._originals:
+            setattr(cls, method, original)
+
+        self._originals.clear()
+
+    def _timed(self, name, method):
+        # a phase called from another one (e.g. markup from forced_numbers) counts for the outer one
+        def timed(*args, **kwargs):
+            if self._active:
+                return method(*args, **kwargs)
+
+            self._active = True
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.seconds[name] += time.perf_counter() - start
+                self.calls[name] += 1
+                self._active = False
+
+        return timed
+
+
+def bundled_corpus():
+    puzzles = []
+    for name in sorted(os.listdir(PUZZLES_DIR)):
+        path = os.path.join(PUZZLES_DIR, name)
+
+        # the graded corpora have a directory of their own
+        if not os.path.isfile(path):
+            continue
+
+        with open(path) as f:
+            puzzles.extend(SolverIO.iter_strings(f))
+
+    return puzzles
+
+
+def graded_corpus(grade, count, seed):
+    # unique puzzles of a grade of generate.py: read from GRADED_DIR if it holds them, generated
+    # otherwise. Both give the same puzzles for the same seed
+    path = os.path.join(GRADED_DIR, grade)
+
+    if seed == 0 and os.path.isfile(path):
+        with open(path) as f:
+            puzzles = list(itertools.islice(SolverIO.iter_strings(f), count))
+
+        if len(puzzles) == count:
+            return puzzles
+
+    return [str_puzzle for str_puzzle, puzzle_grade, clues in generate_all(count, grade, seed=seed)]
+
+
+def generated_corpus(clues, count, seed, size=9):
+    # same seed, same corpus: runs stay comparable
+    rng = random.Random(seed)
+    solver = Solver([], size=size)
+    solver.solve()
+    grid = solver.get_board()
+
+    puzzles = []
+    for i in range(count):
+        full = random_transform(rng, size).apply(grid)
+        keep = set(rng.sample(range(size * size), clues))
+        puzzles.append(SolverIO.to_string(full[k] if k in keep else 0 for k in range(size * size)))
+
+    return puzzles
+
+
+def percentile(values, p):
+    # nearest rank, values sorted
+    if not values:
+        return 0.0
+
+    return values[min(len(values) - 1, max(0, (len(values) * p + 99) // 100 - 1))]
+
+
+def run_corpus(puzzles, strategy, memory_sample, engine='crook'):
+    # latencies without instrumentation, then phases, then allocations of a sample
+    latencies = []
+    nodes = 0
+    unsolved = 0
+    for str_puzzle in puzzles:
+        cells = SolverIO.from_string(str_puzzle)
+        start = time.perf_counter()
+        solver = Solver(cells, strategy, size=SolverIO.board_size(str_puzzle), engine=engine)
+        solved = solver.solve()
+        latencies.append(time.perf_counter() - start)
+        nodes += solver.nodes
+        unsolved += not solved
+
+    with PhaseTimer() as timer:
+        for str_puzzle in puzzles:
+            Solver(SolverIO.from_string(str_puzzle), strategy, size=SolverIO.board_size(str_puzzle),
+                   engine=engine).solve()
+
+    peaks = []
+    blocks = []
+    for str_puzzle in puzzles[:memory_sample]:
+        cells = SolverIO.from_string(str_puzzle)
+        tracemalloc.start()
+        solver = Solver(cells, strategy, size=SolverIO.board_size(str_puzzle), engine=engine)
+        solver.solve()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        blocks.append(sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename')))
+        tracemalloc.stop()
+
+    total = sum(latencies)
+    latencies.sort()
+
+    return dict(
+        puzzles=len(puzzles),
+        unsolved=unsolved,
+        seconds=total,
+        puzzles_per_sec=len(puzzles) / total if total else 0.0,
+        latency_ms=dict(
+            [('p{}'.format(p), 1000 * percentile(latencies, p)) for p in PERCENTILES],
+            max=1000 * latencies[-1] if latencies else 0.0,
+        ),
+        nodes=nodes,
+        phases={name: dict(seconds=timer.seconds[name], calls=timer.calls[name]) for name in timer.seconds},
+        memory=dict(
+            sample=len(peaks),
+            peak_kib=max(peaks) / 1024 if peaks else 0.0,
+            mean_peak_kib=sum(peaks) / len(peaks) / 1024 if peaks else 0.0,
+            mean_blocks=sum(blocks) / len(blocks) if blocks else 0.0,
+        ),
+    )
+
+
+def run(corpora, strategy='mrv', memory_sample=20, engine='crook'):
+    return dict(
+        python=platform.python_version(),
+        machine=platform.machine(),
+        strategy=strategy,
+        engine=engine,
+        corpora={name: run_corpus(puzzles, strategy, memory_sample, engine) for name, puzzles in corpora},
+    )
+
+
+def compare(baseline, current):
+    # one line per corpus in both runs, ratios > 1 mean the current run is faster
+    lines = []
+    for name, result in current['corpora'].items():
+        if name not in baseline['corpora']:
+            continue
+
+        base = baseline['corpora'][name]
+        speedup = result['puzzles_per_sec'] / base['puzzles_per_sec'] if base['puzzles_per_sec'] else 0.0
+        p90 = base['latency_ms']['p90'] / result['latency_ms']['p90'] if result['latency_ms']['p90'] else 0.0
+        lines.append('{:<10} throughput x{:.2f}  p90 x{:.2f}  nodes {} -> {}'.format(
+            name, speedup, p90, base['nodes'], result['nodes']))
+
+    return lines
+
+
+def compare_engines(results):
+    # one line per corpus: throughput and p99 of every engine, and the fastest one
+    lines = []
+    for name in results[0]['corpora']:
+        corpora = [(result['engine'], result['corpora'][name]) for result in results]
+        best = max(corpora, key=lambda item: item[1]['puzzles_per_sec'])[0]
+        lines.append('{:<10} {}  fastest: {}'.format(name, '  '.join(
+            '{} {:.1f}/s p99 {:.2f}ms'.format(engine, corpus['puzzles_per_sec'], corpus['latency_ms']['p99'])
+            for engine, corpus in corpora), best))
+
+    return lines
+
+
+def report(result):
+    lines = []
+    for name, corpus in result['corpora'].items():
+        latency = corpus['latency_ms']
+        lines.append('{:<10} {:>5} puzzles {:>9.1f}/s  p50 {:.2f}ms  p90 {:.2f}ms  p99 {:.2f}ms  max {:.2f}ms'.format(
+            name, corpus['puzzles'], corpus['puzzles_per_sec'],
+            latency['p50'], latency['p90'], latency['p99'], latency['max']))
+
+        phases = corpus['phases']
+        total = sum(phase['seconds'] for phase in phases.values()) or 1.0
+        lines.append('{:<10} {}'.format('', '  '.join(
+            '{} {:.0f}%'.format(phase, 100 * phases[phase]['seconds'] / total)
+            for phase in phases if phases[phase]['calls'])))
+        lines.append('{:<10} peak {:.1f}KiB  blocks {:.0f}'.format(
+            '', corpus['memory']['peak_kib'], corpus['memory']['mean_blocks']))
+
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 -m app.solver.benchmark')
+    parser.add_argument('files', nargs='*', help='extra corpora, one puzzle per line or one line per row')
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='mrv')
+    parser.add_argument('--engine', choices=ENGINES, action='append',
+                        help='solver engine, repeat to compare engines (default: crook)')
+    parser.add_argument('--size', type=int, default=200, help='puzzles per graded corpus, 0 skips them (default: 200)')
+    parser.add_argument('--scaling-size', type=int, default=20,
+                        help='puzzles per board size in the scaling corpora, 0 skips them (default: 20)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated corpora (default: 0)')
+    parser.add_argument('--memory-sample', type=int, default=20,
+                        help='puzzles per corpus traced for allocations (default: 20)')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='times each puzzle of the corpus files is solved (default: 1)')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    args = parser.parse_args()
+
+    corpora = [('bundled', bundled_corpus())]
+
+    if args.size:
+        corpora.extend((grade, graded_corpus(grade, args.size, args.seed)) for grade, share in GRADES)
+
+    if args.scaling_size:
+        corpora.extend(
+            ('{0}x{0}'.format(size), generated_corpus(int(share * size * size), args.scaling_size, args.seed, size))
+            for size, share in SCALING
+        )
+
+    try:
+        for path in args.files:
+            with open(path) as f:
+                corpora.append((os.path.basename(path), list(SolverIO.iter_strings(f)) * args.repeat))
+    except ValueError as e:
+        sys.exit('error: {}'.format(e))
+
+    engines = args.engine or ['crook']
+    results = []
+    for engine in engines:
+        results.append(run(corpora, args.strategy, args.memory_sample, engine))
+
+        if len(engines) > 1:
+            print(engine)
+        print('\n'.join(report(results[-1])))
+
+    if len(results) > 1:
+        print('\n'.join(compare_engines(results)))
+
+    # --output and --baseline are about the first engine
+    result = results[0]
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print('\n'.join(compare(json.load(f), result)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+from array import array
+from functools import lru_cache
+from math import isqrt
+
+from .topology import topology
+
+# masks up to this many bits get full lookup tables, longer ones are memoized as they show up
+TABLE_BITS = 9
+# memoized masks kept before a table starts over
+MEMO_SIZE = 1 << 20
+
+
+def _values(mask):
+    values = []
+    val = 1
+    while mask:
+        if mask & 1:
+            values.append(val)
+        mask >>= 1
+        val += 1
+
+    return tuple(values)
+
+
+class _Memo(dict):
+    def __init__(self, function):
+        super().__init__()
+        self.function = function
+
+    def __missing__(self, mask):
+        if len(self) >= MEMO_SIZE:
+            self.clear()
+
+        value = self[mask] = self.function(mask)
+        return value
+
+
+class MaskTables:
+    def __init__(self, size):
+        # every cell stores its candidates as a size-bit mask: bit v - 1 is set if v is still possible
+        self.size = size
+        self.all = (1 << size) - 1
+
+        # indexed by candidate mask
+        if size <= TABLE_BITS:
+            self.popcount = bytes(bin(mask).count('1') for mask in range(self.all + 1))
+            self.values = tuple(_values(mask) for mask in range(self.all + 1))
+            self.bits = tuple(tuple(1 << (val - 1) for val in values) for values in self.values)
+            self.digit = bytes(values[0] if len(values) == 1 else 0 for values in self.values)
+        else:
+            self.popcount = _Memo(lambda mask: bin(mask).count('1'))
+            self.values = _Memo(_values)
+            self.bits = _Memo(lambda mask: tuple(1 << (val - 1) for val in _values(mask)))
+            self.digit = _Memo(lambda mask: mask.bit_length() if mask & (mask - 1) == 0 else 0)
+
+
+@lru_cache(maxsize=None)
+def mask_tables(size):
+    return MaskTables(size)
+
+
+def bit(val):
+    return 1 << (val - 1)
+
+
+def box_size(size):
+    box = isqrt(size)
+
+    if box < 2 or box * box != size:
+        raise ValueError('board size must be a square of at least 4, found {}'.format(size))
+
+    return box
+
+
+class Board:
+    def __init__(self, cells, size=9):
+        self.size = size
+        self.topology = topology(box_size(size))
+        self.masks = mask_tables(size)
+        # the tables used on every removal
+        self.popcount = self.masks.popcount
+        self.cell_units = self.topology.cell_units
+        # 16 bits hold the candidates of a 16x16 board, 25x25 needs 32
+        typecode = 'H' if size <= 16 else 'L'
+        self.cells = array(typecode, [self.masks.all]) * len(self.topology.cells)
+
+        for e in cells:
+            row = e[0]
+            col = e[1]
+            val = e[2]
+            self.cells[size * row + col] = bit(val)
+
+        self.unsolved = sum(1 for mask in self.cells if self.popcount[mask] > 1)
+        # places[size * unit + val - 1]: the number of cells of the unit where val is still possible
+        self.values = self.masks.values
+        self.cell_places = tuple(tuple(size * unit - 1 for unit in units) for units in self.cell_units)
+        self.places = array('B', [0]) * (size * len(self.topology.units))
+        places = self.places
+        # givens repeated in a unit: if any, the board has no solution either
+        self.repeated_givens = 0
+        for unit, unit_cells in enumerate(self.topology.units):
+            offset = size * unit - 1
+            # a new board only holds givens and cells where every value is possible
+            given = [self.masks.digit[self.cells[k]] for k in unit_cells]
+            open_cells = given.count(0)
+            for val in range(1, size + 1):
+                places[offset + val] = open_cells
+            for val in given:
+                if val:
+                    if places[offset + val] > open_cells:
+                        self.repeated_givens += 1
+
+                    places[offset + val] += 1
+        # values left without a place in some unit: if any, the board has no solution
+        self.dead_units = places.count(0)
+        # units with candidates removed since the last preemptive set pass
+        self.dirty = set(range(len(self.topology.units)))
+        # per cell, the search decisions its candidates were removed because of: bit i for the
+        # choice of the i-th search path, 0 for the givens
+        self.reasons = [0] * len(self.cells)
+        # every removal in order: the cell, the candidates removed from it and its reasons before
+        self.trail_cells = array('H')
+        self.trail_bits = array(typecode)
+        self.trail_reasons = []
+
+    def __getitem__(self, index):
+        return self.cells[index]
+
+    def __len__(self):
+        return len(self.cells)
+
+    def remove(self, k, bits, reason=0):
+        # bits must be candidates of the cell, reason the decisions that rule them out
+        mask = self.cells[k] & ~bits
+        self.cells[k] = mask
+        self.trail_cells.append(k)
+        self.trail_bits.append(bits)
+        self.trail_reasons.append(self.reasons[k])
+        self.reasons[k] |= reason
+
+        if self.popcount[mask] == 1:
+            self.unsolved -= 1
+
+        places = self.places
+        cell_places = self.cell_places[k]
+        for val in self.values[bits]:
+            for offset in cell_places:
+                i = offset + val
+                places[i] -= 1
+
+                if not places[i]:
+                    self.dead_units += 1
+
+        self.dirty.update(self.cell_units[k])
+        return mask
+
+    def restore(self, k, bits):
+        mask = self.cells[k]
+
+        if self.popcount[mask] == 1:
+            self.unsolved += 1
+
+        self.cells[k] = mask | bits
+        self.dirty.update(self.cell_units[k])
+
+        places = self.places
+        cell_places = self.cell_places[k]
+        for val in self.values[bits]:
+            for offset in cell_places:
+                i = offset + val
+
+                if not places[i]:
+                    self.dead_units -= 1
+
+                places[i] += 1
+
+    def checkpoint(self):
+        return len(self.trail_cells)
+
+    def undo(self, checkpoint):
+        trail_cells = self.trail_cells
+        trail_bits = self.trail_bits
+        trail_reasons = self.trail_reasons
+        reasons = self.reasons
+
+        for i in range(len(trail_cells) - 1, checkpoint - 1, -1):
+            self.restore(trail_cells[i], trail_bits[i])
+            reasons[trail_cells[i]] = trail_reasons[i]
+
+        del trail_cells[checkpoint:]
+        del trail_bits[checkpoint:]
+        del trail_reasons[checkpoint:]
+
+    def solved(self):
+        return self.unsolved == 0
+
+    def dead(self):
+        return self.dead_units > 0
+
+    def clash(self):
+        return self.repeated_givens > 0
+
+    def hidden_single(self, k, val):
+        # val has no other place in the row, column or box of cell k
+        places = self.places
+        for offset in self.cell_places[k]:
+            if places[offset + val] == 1:
+                return True
+
+        return False
+
+    def unit_reasons(self, unit):
+        reasons = 0
+        for k in self.topology.units[unit]:
+            reasons |= self.reasons[k]
+
+        return reasons
+
+    def dead_unit(self, k):
+        # a unit of cell k with a value left without a place, None if there is none
+        size = self.size
+        places = self.places
+        for unit in self.cell_units[k]:
+            if 0 in places[size * unit:size * (unit + 1)]:
+                return unit
+
+    def consistent(self):
+        # a solved board is consistent if no unit holds a digit twice
+        cells = self.cells
+        for unit in self.topology.units:
+            mask = 0
+            for k in unit:
+                mask |= cells[k]
+
+            if mask != self.masks.all:
+                return False
+
+        return True
+
+    def candidates(self, row, col):
+        return self.masks.values[self.cells[self.size * row + col]]
+
+    def digits(self):
+        digit = self.masks.digit
+        return [digit[mask] for mask in self.cells]
@@ -0,0 +1,111 @@
+from .errors import NoSolutionException
+
+
+class BranchingStrategy:
+    name = None
+
+    def __init__(self, board, preemptive_set, rng=None):
+        self.board = board
+        self.preemptive_set = preemptive_set
+        # a random.Random to pick among equally good cells, None for the first of them
+        self.rng = rng
+
+    def next_cell(self):
+        # returns the open cell the search branches on next
+        raise NotImplementedError
+
+
+class MinimumRemainingValues(BranchingStrategy):
+    name = 'mrv'
+
+    def next_cell(self):
+        cells = self.board.cells
+        popcount = self.board.masks.popcount
+        min_markup_len = self.board.size + 1
+        min_cell = None
+
+        for cell in self.board.topology.cells:
+            markup_len = popcount[cells[cell]]
+            if 1 < markup_len < min_markup_len:
+                min_markup_len = markup_len
+                min_cell = cell
+
+                if markup_len == 2:
+                    break
+
+        if min_cell is None:
+            raise NoSolutionException('no cell left to branch on')
+
+        if self.rng is not None:
+            ties = [cell for cell in self.board.topology.cells if popcount[cells[cell]] == min_markup_len]
+            return self.rng.choice(ties)
+
+        return min_cell
+
+
+class MinimumRemainingValuesDegree(BranchingStrategy):
+    name = 'mrv-degree'
+
+    def next_cell(self):
+        cells = self.board.cells
+        popcount = self.board.masks.popcount
+        peers = self.board.topology.peers
+        min_markup_len = self.board.size + 1
+        max_degree = -1
+        min_cell = None
+        ties = []
+
+        for cell in self.board.topology.cells:
+            markup_len = popcount[cells[cell]]
+            if 1 < markup_len <= min_markup_len:
+                # break ties by the number of unsolved peers
+                degree = 0
+                for p in peers[cell]:
+                    if popcount[cells[p]] > 1:
+                        degree += 1
+
+                if markup_len < min_markup_len or degree > max_degree:
+                    min_markup_len = markup_len
+                    max_degree = degree
+                    min_cell = cell
+                    ties = [cell]
+                elif degree == max_degree:
+                    ties.append(cell)
+
+        if min_cell is None:
+            raise NoSolutionException('no cell left to branch on')
+
+        if self.rng is not None:
+            return self.rng.choice(ties)
+
+        return min_cell
+
+
+class PreemptivePairFirst(MinimumRemainingValues):
+    name = 'pair'
+
+    def next_cell(self):
+        preemptive_pair = self.preemptive_set.find(pair=True)
+
+        if preemptive_pair is not None:
+            if self.rng is not None:
+                return self.rng.choice(preemptive_pair.cells)
+
+            return preemptive_pair.cells[0]
+
+        return super().next_cell()
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (MinimumRemainingValues, MinimumRemainingValuesDegree, PreemptivePairFirst)
+}
+
+
+def branching_strategy(name, board, preemptive_set, rng=None):
+    try:
+        strategy = STRATEGIES[name]
+    except KeyError:
+        raise ValueError('unknown branching strategy: {}'.format(name))
+
+    return strategy(board, preemptive_set, rng)
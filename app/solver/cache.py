@@ -0,0 +1,91 @@
+from collections import OrderedDict
+
+from .canonical import canonicalize
+from .solver import Solver
+from .store import NO_SOLUTION
+
+
+class SolutionCache:
+    def __init__(self, maxsize=10000, strategy='mrv', store=None):
+        self.maxsize = maxsize
+        self.strategy = strategy
+        # optional SolutionStore shared with other processes, looked up on a miss
+        self.store = store
+        # canonical puzzle -> canonical solution (None if there is none), least recent first
+        self.solutions = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.store_hits = 0
+
+    def solve(self, cells, stats=None, deadline=None, max_nodes=None, engine='crook', portfolio=0):
+        # same input as Solver, returns the solved board like Solver.get_board or None;
+        # stats (a SolveStats) only collects anything if the puzzle had to be solved,
+        # deadline and max_nodes are passed on to Solver.solve, engine and portfolio to Solver
+        grid = [0] * 81
+        for e in cells:
+            grid[9 * e[0] + e[1]] = e[2]
+
+        canonical, transform = canonicalize(grid)
+        key = bytes(canonical)
+
+        if key in self.solutions:
+            self.hits += 1
+            self.solutions.move_to_end(key)
+            solution = self.solutions[key]
+        else:
+            self.misses += 1
+            solution = self._lookup(key, canonical, stats, deadline, max_nodes, engine, portfolio)
+
+            if self.maxsize:
+                self.solutions[key] = solution
+
+            if len(self.solutions) > self.maxsize:
+                self.solutions.popitem(last=False)
+                self.evictions += 1
+
+        if solution is None:
+            return None
+
+        return transform.invert(solution)
+
+    def _lookup(self, key, canonical, stats, deadline, max_nodes, engine, portfolio):
+        if self.store is None:
+            return self._solve(canonical, stats, deadline, max_nodes, engine, portfolio)
+
+        solution = self.store.get(key)
+
+        if solution is not None:
+            self.store_hits += 1
+            return solution or None
+
+        solution = self._solve(canonical, stats, deadline, max_nodes, engine, portfolio)
+        self.store.put(key, NO_SOLUTION if solution is None else solution)
+        return solution
+
+    def _solve(self, canonical, stats, deadline, max_nodes, engine, portfolio):
+        cells = [(k // 9, k % 9, val) for k, val in enumerate(canonical) if val]
+        solver = Solver(cells, strategy=self.strategy, stats=stats, engine=engine, portfolio=portfolio)
+
+        if not solver.solve(deadline, max_nodes):
+            return None
+
+        return bytes(solver.get_board())
+
+    def __len__(self):
+        return len(self.solutions)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return dict(
+            size=len(self.solutions),
+            maxsize=self.maxsize,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            store_hits=self.store_hits,
+            hit_rate=self.hit_rate(),
+        )
@@ -0,0 +1,196 @@
+from array import array
+from itertools import permutations
+
+from .board import box_size
+
+# canonical form: among all transpositions, band/stack orders and row/column orders
+# within bands/stacks, take the one with the largest clue pattern (rows compared as
+# 9-bit masks, column 0 in the high bit), then the smallest digits once they are
+# relabelled in order of first appearance
+
+# ties are pruned to this many candidates: beyond that the form of a very regular
+# pattern (e.g. a full grid) depends on the input, which only costs cache hits
+MAX_CANDIDATES = 2048
+
+_tables = None
+
+
+def _orders():
+    # the 1296 column orders that keep the columns of each stack together
+    orders = []
+    for stacks in permutations(range(3)):
+        for a in permutations(range(3)):
+            for b in permutations(range(3)):
+                for c in permutations(range(3)):
+                    within = a, b, c
+                    orders.append(tuple(3 * stacks[i] + within[i][j] for i in range(3) for j in range(3)))
+
+    return orders
+
+
+def _build_tables():
+    orders = _orders()
+    # mask of a row after reordering its columns, for every order and mask
+    permuted = []
+    for order in orders:
+        bits = [0] * 9
+        for j in range(9):
+            bits[order[j]] = 1 << (8 - j)
+
+        table = array('H', [0]) * 512
+        for mask in range(1, 512):
+            low = mask & -mask
+            table[mask] = table[mask ^ low] | bits[8 - (low.bit_length() - 1)]
+        permuted.append(table)
+
+    # largest reordered mask of every row mask, and the orders reaching it
+    best = []
+    for mask in range(512):
+        top = max(table[mask] for table in permuted)
+        best.append((top, tuple(i for i, table in enumerate(permuted) if table[mask] == top)))
+
+    return orders, permuted, best
+
+
+def _get_tables():
+    global _tables
+
+    if _tables is None:
+        _tables = _build_tables()
+
+    return _tables
+
+
+class Transform:
+    __slots__ = ('positions', 'digits')
+
+    def __init__(self, positions, digits):
+        # canonical cell k holds the digit of original cell positions[k], relabelled
+        self.positions = positions
+        self.digits = digits
+
+    def apply(self, grid):
+        digits = self.digits
+        return [digits[grid[p]] for p in self.positions]
+
+    def invert(self, grid):
+        inverse = [0] * 10
+        for val in range(1, 10):
+            inverse[self.digits[val]] = val
+
+        original = [0] * 81
+        for k, p in enumerate(self.positions):
+            original[p] = inverse[grid[k]]
+
+        return original
+
+
+def random_transform(rng, size=9):
+    # a random symmetry of the board: digits relabelled, bands, stacks, rows and columns
+    # shuffled, and transposed half of the time
+    box = box_size(size)
+    rows = [box * band + row for band in rng.sample(range(box), box) for row in rng.sample(range(box), box)]
+    cols = [box * stack + col for stack in rng.sample(range(box), box) for col in rng.sample(range(box), box)]
+
+    if rng.random() < 0.5:
+        positions = [size * rows[i] + cols[j] for i in range(size) for j in range(size)]
+    else:
+        positions = [size * cols[j] + rows[i] for i in range(size) for j in range(size)]
+
+    return Transform(positions, [0] + rng.sample(range(1, size + 1), size))
+
+
+def _next_rows(rows):
+    i = len(rows)
+
+    if i % 3:
+        # the rest of the current band
+        band = rows[-1] // 3
+        return [r for r in range(3 * band, 3 * band + 3) if r not in rows]
+
+    # the first row of any band not used yet
+    used = {r // 3 for r in rows}
+    return [r for r in range(9) if r // 3 not in used]
+
+
+def _relabel(grid, positions, bound):
+    # returns None as soon as the relabelled grid is larger than bound
+    digits = [0] * 10
+    label = 0
+    canonical = []
+    prefix = bound is not None
+
+    for k, p in enumerate(positions):
+        val = grid[p]
+        if val and not digits[val]:
+            label += 1
+            digits[val] = label
+        canonical.append(digits[val])
+
+        if prefix and digits[val] != bound[k]:
+            if digits[val] > bound[k]:
+                return None, None
+            prefix = False
+
+    # digits missing from the puzzle take the remaining labels in order
+    for val in range(1, 10):
+        if not digits[val]:
+            label += 1
+            digits[val] = label
+
+    return canonical, digits
+
+
+def canonicalize(grid):
+    # grid: 81 digits, 0 for an empty cell; returns the canonical grid and its Transform
+    orders, permuted, best = _get_tables()
+    transposed = [grid[9 * (k % 9) + k // 9] for k in range(81)]
+    masks = []
+    for g in (grid, transposed):
+        row_masks = []
+        for r in range(9):
+            mask = 0
+            for c in range(9):
+                if g[9 * r + c]:
+                    mask |= 1 << (8 - c)
+            row_masks.append(mask)
+        masks.append(row_masks)
+
+    # first row: any row of either orientation, under the best column orders
+    top = max(best[mask][0] for row_masks in masks for mask in row_masks)
+    candidates = [
+        (t, (r,), o)
+        for t in range(2) for r in range(9) if best[masks[t][r]][0] == top
+        for o in best[masks[t][r]][1]
+    ][:MAX_CANDIDATES]
+
+    # following rows: keep the candidates with the largest next row
+    for i in range(1, 9):
+        top = -1
+        extended = []
+        for t, rows, o in candidates:
+            table = permuted[o]
+            for r in _next_rows(rows):
+                value = table[masks[t][r]]
+                if value > top:
+                    top = value
+                    extended = [(t, rows + (r,), o)]
+                elif value == top and len(extended) < MAX_CANDIDATES:
+                    extended.append((t, rows + (r,), o))
+        candidates = extended
+
+    # the same pattern: keep the smallest digits
+    best_grid = None
+    for t, rows, o in candidates:
+        cols = orders[o]
+        if t:
+            positions = [9 * cols[j] + rows[i] for i in range(9) for j in range(9)]
+        else:
+            positions = [9 * rows[i] + cols[j] for i in range(9) for j in range(9)]
+
+        canonical, digits = _relabel(grid, positions, best_grid)
+        if canonical is not None and canonical != best_grid:
+            best_grid = canonical
+            transform = Transform(positions, digits)
+
+    return best_grid, transform
@@ -0,0 +1,236 @@
+from functools import lru_cache
+from time import monotonic
+
+from .board import box_size
+from .errors import TimeoutException
+
+
+class Links:
+    # the exact cover matrix of a board, as Dancing Links. The columns are the constraints:
+    # a column per cell, then per row and value, per column and value and per box and value.
+    # The rows are the placements: a row per cell and value, with a node in each of its 4
+    # columns. Nodes are indices into flat lists of links, not objects: 0 is the root, 1 to
+    # columns are the column headers, then the 4 nodes of every row in turn
+    def __init__(self, size):
+        box = box_size(size)
+        cells = size * size
+        self.size = size
+        self.columns = 4 * cells
+        self.first = self.columns + 1
+        nodes = self.first + 4 * cells * size
+
+        # root and column headers are linked left and right, nodes up and down their column
+        self.left = [self.columns] + list(range(self.columns))
+        self.right = list(range(1, self.columns + 1)) + [0]
+        self.up = list(range(self.first)) + [0] * (nodes - self.first)
+        self.down = list(range(self.first)) + [0] * (nodes - self.first)
+        self.column = list(range(self.first)) + [0] * (nodes - self.first)
+        self.sizes = [0] * self.first
+
+        for k in range(cells):
+            row, col = divmod(k, size)
+            square = (row // box) * box + col // box
+            for val in range(size):
+                node = self.first + 4 * (k * size + val)
+                for i, c in enumerate((
+                    1 + k,
+                    1 + cells + row * size + val,
+                    1 + 2 * cells + col * size + val,
+                    1 + 3 * cells + square * size + val,
+                )):
+                    # append to the bottom of the column
+                    self.column[node + i] = c
+                    self.up[node + i] = self.up[c]
+                    self.down[node + i] = c
+                    self.down[self.up[c]] = node + i
+                    self.up[c] = node + i
+                    self.sizes[c] += 1
+
+        # the other nodes of the row of every node, left to right and back: rows never change,
+        # so they need no links
+        self.others = [()] * self.first + [
+            tuple(base + (i + j) % 4 for j in range(1, 4))
+            for base in range(self.first, nodes, 4) for i in range(4)
+        ]
+        self.others_back = [tuple(reversed(others)) for others in self.others]
+
+
+@lru_cache(maxsize=None)
+def links(size):
+    return Links(size)
+
+
+class DancingLinks:
+    def __init__(self, cells, size=9):
+        template = links(size)
+        self.size = size
+        self.first = template.first
+        # the links that change while searching, copied from the template of the board size
+        self.left = list(template.left)
+        self.right = list(template.right)
+        self.up = list(template.up)
+        self.down = list(template.down)
+        self.sizes = list(template.sizes)
+        self.column = template.column
+        self.others = template.others
+        self.others_back = template.others_back
+
+        self.grid = [0] * (size * size)
+        self.nodes = 0
+        # counters for SolveStats: columns searched, columns without a row left, columns
+        # whose rows all failed and the deepest search
+        self.paths_created = 0
+        self.violations = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.consistent = self._place(cells)
+
+    def _place(self, cells):
+        # covers the columns of the givens, False if two givens clash
+        size = self.size
+        left = self.left
+        right = self.right
+        column = self.column
+
+        for e in cells:
+            self.grid[size * e[0] + e[1]] = e[2]
+
+        for e in cells:
+            k = size * e[0] + e[1]
+            node = self.first + 4 * (k * size + e[2] - 1)
+
+            for i in range(4):
+                c = column[node + i]
+                if right[left[c]] != c:
+                    # already covered by another given
+                    return False
+
+            for i in range(4):
+                self._cover(column[node + i])
+
+        return True
+
+    def _cover(self, c):
+        up = self.up
+        down = self.down
+        sizes = self.sizes
+        column = self.column
+        others = self.others
+
+        self.left[self.right[c]] = self.left[c]
+        self.right[self.left[c]] = self.right[c]
+
+        i = down[c]
+        while i != c:
+            for j in others[i]:
+                up[down[j]] = up[j]
+                down[up[j]] = down[j]
+                sizes[column[j]] -= 1
+            i = down[i]
+
+    def _uncover(self, c):
+        up = self.up
+        down = self.down
+        sizes = self.sizes
+        column = self.column
+        others_back = self.others_back
+
+        i = up[c]
+        while i != c:
+            for j in others_back[i]:
+                sizes[column[j]] += 1
+                up[down[j]] = j
+                down[up[j]] = j
+            i = up[i]
+
+        self.left[self.right[c]] = c
+        self.right[self.left[c]] = c
+
+    def search(self, limit=1, deadline=None, max_nodes=None):
+        # Algorithm X on the column with the fewest rows: up to limit solutions, as digit lists
+        solutions = []
+        if not self.consistent:
+            return solutions
+
+        right = self.right
+        down = self.down
+        sizes = self.sizes
+        column = self.column
+        others = self.others
+        others_back = self.others_back
+        cover = self._cover
+        uncover = self._uncover
+        # the row node taken at every depth
+        chosen = []
+
+        while True:
+            c = right[0]
+
+            if c == 0:
+                solutions.append(self._solution(chosen))
+                if len(solutions) >= limit:
+                    break
+            else:
+                best = c
+                fewest = sizes[c]
+                c = right[c]
+                while c and fewest > 1:
+                    if sizes[c] < fewest:
+                        best = c
+                        fewest = sizes[c]
+                    c = right[c]
+
+                if fewest:
+                    cover(best)
+                    self.paths_created += 1
+                    r = down[best]
+                    chosen.append(r)
+                    for j in others[r]:
+                        cover(column[j])
+
+                    self.max_depth = max(self.max_depth, len(chosen))
+                    self._node(deadline, max_nodes)
+                    continue
+
+                # a constraint nothing can meet anymore
+                self.violations += 1
+
+            # the next row of the deepest column with one left, the others are done
+            while chosen:
+                r = chosen.pop()
+                for j in others_back[r]:
+                    uncover(column[j])
+
+                c = column[r]
+                r = down[r]
+                if r != c:
+                    chosen.append(r)
+                    for j in others[r]:
+                        cover(column[j])
+
+                    self._node(deadline, max_nodes)
+                    break
+
+                uncover(c)
+                self.backtracks += 1
+            else:
+                break
+
+        return solutions
+
+    def _node(self, deadline, max_nodes):
+        self.nodes += 1
+
+        if max_nodes is not None and self.nodes > max_nodes:
+            raise TimeoutException('more than {} search nodes'.format(max_nodes))
+        if deadline is not None and monotonic() > deadline:
+            raise TimeoutException('deadline passed after {} search nodes'.format(self.nodes))
+
+    def _solution(self, chosen):
+        size = self.size
+        grid = list(self.grid)
+        for r in chosen:
+            k, val = divmod((r - self.first) // 4, size)
+            grid[k] = val + 1
+
+        return grid
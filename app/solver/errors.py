@@ -1,9 +1,8 @@
-class ViolationException(Exception):
-    def __init__(self, row, col):
-        self.row = row
-        self.col = col
+class NoSolutionException(Exception):
+    def __init__(self, message):
+        self.message = message
 
 
-class NoSolutionException(Exception):
+class TimeoutException(Exception):
     def __init__(self, message):
         self.message = message
@@ -0,0 +1,192 @@
+import argparse
+import collections
+import json
+import random
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from .board import bit, box_size
+from .canonical import random_transform
+from .errors import TimeoutException
+from .solver import BOARD_SIZES, Solver, SolverIO
+from .stats import SolveStats
+from .topology import topology
+
+# grades by the work the solver needs, easiest first, and the share of the cells
+# the digger stops at when aiming for them
+GRADES = (
+    ('easy', 0.45),
+    ('medium', 0.37),
+    ('hard', 0.32),
+    ('expert', 0.27),
+)
+
+# clues removed in one go before digging cell by cell, down to this share of the cells:
+# clues are then put back until the solution is unique
+BULK_SHARE = 0.5
+
+# search nodes of a uniqueness check, past them the clue is kept
+CHECK_MAX_NODES = 2000
+
+
+def grade(cells, size=9):
+    stats = SolveStats()
+    Solver(cells, stats=stats, size=size).solve()
+
+    if stats.nodes:
+        # a wrong choice had to be taken back
+        return 'expert' if stats.violations else 'hard'
+
+    return 'medium' if stats.preemptive_sets else 'easy'
+
+
+def solutions(digits, size=9):
+    # up to two solutions of the puzzle, None if the search gave up
+    cells = [(k // size, k % size, val) for k, val in enumerate(digits) if val]
+    try:
+        return Solver(cells, size=size).count_solutions(2, max_nodes=CHECK_MAX_NODES)[1]
+    except TimeoutException:
+        return None
+
+
+def unique_without(digits, k, size=9):
+    # digits has a unique solution: without its clue at k it keeps it if the clues
+    # left allow no other value there
+    val = digits[k]
+    peers = topology(box_size(size)).peers[k]
+    if len(set(digits[i] for i in peers if digits[i])) == size - 1:
+        # the peers hold every other value
+        return True
+
+    solver = Solver([(i // size, i % size, v) for i, v in enumerate(digits) if v and i != k], size=size)
+    solver.board.remove(k, bit(val))
+    try:
+        return not solver.solve(max_nodes=CHECK_MAX_NODES)
+    except TimeoutException:
+        return False
+
+
+def random_grid(rng, grid, size=9):
+    # the solver completes a few cells of a shuffled grid, most often to another grid
+    full = random_transform(rng, size).apply(grid)
+    keep = rng.sample(range(size * size), size)
+    solver = Solver([(k // size, k % size, full[k]) for k in keep], size=size)
+    try:
+        if solver.solve(max_nodes=CHECK_MAX_NODES):
+            return solver.get_board()
+    except TimeoutException:
+        pass
+
+    return full
+
+
+def dig(rng, grid, clues, size=9):
+    # empties the cells of a full grid in random order, down to clues, as long as the
+    # puzzle keeps a unique solution
+    cells = size * size
+    order = rng.sample(range(cells), cells)
+    puzzle = list(grid)
+
+    bulk = max(0, cells - max(clues, int(BULK_SHARE * cells)))
+    for k in order[:bulk]:
+        puzzle[k] = 0
+
+    while True:
+        found = solutions(puzzle, size)
+        if found is not None and len(found) == 1:
+            break
+
+        # put a clue back, where another solution differs from the grid if there is one
+        empty = [k for k in order[:bulk] if not puzzle[k] and (found is None or any(s[k] != grid[k] for s in found))]
+        k = rng.choice(empty)
+        puzzle[k] = grid[k]
+
+    order = order[bulk:]
+    left = sum(1 for val in puzzle if val)
+    for k in order:
+        if left <= clues:
+            break
+
+        if unique_without(puzzle, k, size):
+            puzzle[k] = 0
+            left -= 1
+
+    return puzzle
+
+
+def generate_chunk(seed, index, count, wanted=None, size=9):
+    # count puzzles of the wanted grade (any if None): (puzzle, grade, clues)
+    # the same seed and index give the same chunk
+    rng = random.Random('{}-{}'.format(seed, index))
+    solver = Solver([], size=size)
+    solver.solve()
+    grid = solver.get_board()
+    shares = dict(GRADES)
+
+    puzzles = []
+    while len(puzzles) < count:
+        target = wanted or rng.choice(GRADES)[0]
+        puzzle = dig(rng, random_grid(rng, grid, size), int(shares[target] * size * size), size)
+        cells = [(k // size, k % size, val) for k, val in enumerate(puzzle) if val]
+        puzzle_grade = grade(cells, size)
+
+        if wanted is None or puzzle_grade == wanted:
+            puzzles.append((SolverIO.to_string(puzzle), puzzle_grade, len(cells)))
+
+    return puzzles
+
+
+def generate_all(count, wanted=None, size=9, seed=0, jobs=1, chunk_size=64):
+    # yields count puzzles in the order of their chunks, the same for any number of jobs
+    sizes = [min(chunk_size, count - start) for start in range(0, count, chunk_size)]
+
+    if jobs == 1:
+        for index, chunk_count in enumerate(sizes):
+            yield from generate_chunk(seed, index, chunk_count, wanted, size)
+        return
+
+    with ProcessPoolExecutor(jobs) as pool:
+        pending = collections.deque()
+
+        for index, chunk_count in enumerate(sizes):
+            pending.append(pool.submit(generate_chunk, seed, index, chunk_count, wanted, size))
+
+            if len(pending) >= 2 * jobs:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
+def format_puzzle(result, output_format):
+    str_puzzle, puzzle_grade, clues = result
+
+    if output_format == 'json':
+        return json.dumps(dict(puzzle=str_puzzle, grade=puzzle_grade, clues=clues))
+
+    return str_puzzle
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 -m app.solver.generate')
+    parser.add_argument('count', type=int, help='puzzles to generate')
+    parser.add_argument('--grade', choices=[name for name, share in GRADES],
+                        help='keep only puzzles of this grade (default: any)')
+    parser.add_argument('--size', type=int, choices=BOARD_SIZES, default=9, help='board size (default: 9)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--jobs', type=int, default=1, help='generator processes (default: 1)')
+    parser.add_argument('--chunk-size', type=int, default=64,
+                        help='puzzles per job of a generator process (default: 64)')
+    parser.add_argument('--format', choices=('line', 'json'), default='line',
+                        help='one puzzle per line, or a JSON object with its grade and clues')
+    args = parser.parse_args()
+
+    if args.count < 0 or args.jobs < 1 or args.chunk_size < 1:
+        sys.exit('error: count must not be negative, jobs and chunk size must be positive')
+
+    for result in generate_all(args.count, args.grade, args.size, args.seed, args.jobs, args.chunk_size):
+        print(format_puzzle(result, args.format))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+class Observer:
+    # search events of a solve, see Solver(cells, observer=...). Cells are board indices,
+    # candidates are bit masks as on the board. Override the events of interest
+    def cross_out(self, k, bits):
+        # candidates removed from cell k, by markup, forced numbers, preemptive sets or a choice
+        pass
+
+    def preemptive_set(self, values, cells):
+        # a preemptive set about to cross out candidates from the rest of its unit: the values
+        # and cells of a naked set, or of a hidden set (the values only left in these cells)
+        pass
+
+    def path_opened(self, k, choices):
+        # the search branches on cell k, its candidates tried in increasing order
+        pass
+
+    def violation(self, k):
+        # a contradiction found at cell k: the current choice is given up
+        pass
+
+    def backtrack(self, k):
+        # the search path on cell k is dropped: every choice failed, or the search jumps back
+        # over it to an earlier choice a conflict came from
+        pass
+
+    def solution(self):
+        # the board is solved, the search goes on if more solutions are wanted
+        pass
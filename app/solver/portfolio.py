@@ -0,0 +1,152 @@
+import multiprocessing
+import os
+
+from multiprocessing.connection import wait
+from time import monotonic
+
+from .branching import STRATEGIES
+from .errors import TimeoutException
+from .preemptive_set import MAX_SET_SIZE
+from .solver import Solver
+from .stats import SolveStats
+
+# search nodes of the plain solve before the runs are started, see Solver.solve
+PORTFOLIO_AFTER = 1000
+# search nodes a restarting run gets before its first restart, times the Luby sequence after
+RESTART_NODES = 100
+# seconds to wait for the runs after the deadline, they stop on their own by then
+DEADLINE_GRACE = 0.5
+
+
+def luby(i):
+    # the i-th term, from 1, of 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+    k = i.bit_length()
+    while i != (1 << k) - 1:
+        i -= (1 << (k - 1)) - 1
+        k = i.bit_length()
+
+    return 1 << (k - 1)
+
+
+def plans(count, strategy='mrv', seed=None):
+    # the runs of a portfolio, as (strategy, seed, restart nodes): the plain solver first, then
+    # the strategies in turn, picking among equally good cells at random and restarting
+    strategies = [strategy] + [name for name in STRATEGIES if name != strategy]
+    runs = [(strategy, seed, None)]
+
+    base = 0 if seed is None else seed
+
+    for i in range(1, count):
+        runs.append((strategies[i % len(strategies)], '{}-{}'.format(base, i), RESTART_NODES))
+
+    return runs
+
+
+def run(cells, size, plan, max_set_size=MAX_SET_SIZE, deadline=None, max_nodes=None, stats=None):
+    # solves with one plan, returns the solved board or None if there is no solution; max_nodes
+    # holds for all restarts together
+    strategy, seed, restart_nodes = plan
+    nodes = 0
+    restart = 0
+
+    while True:
+        restart += 1
+        limit = max_nodes
+
+        if restart_nodes is not None:
+            limit = restart_nodes * luby(restart)
+            if max_nodes is not None:
+                limit = min(limit, max_nodes - nodes)
+
+        solver = Solver(cells, strategy, stats, size, max_set_size,
+                        seed=seed if restart_nodes is None else '{}-{}'.format(seed, restart))
+        try:
+            if solver.solve(deadline, limit):
+                return solver.get_board()
+
+            return None
+        except TimeoutException:
+            if restart_nodes is None or (deadline is not None and monotonic() > deadline):
+                raise
+
+            nodes += solver.nodes
+            if max_nodes is not None and nodes >= max_nodes:
+                raise TimeoutException('more than {} search nodes'.format(max_nodes))
+
+
+def _run(connection, cells, size, plan, max_set_size, deadline, max_nodes):
+    # in the process of a run: sends (board, timeout message, stats) back
+    stats = SolveStats()
+
+    try:
+        result = run(cells, size, plan, max_set_size, deadline, max_nodes, stats), None
+    except TimeoutException as e:
+        result = None, e.message
+
+    connection.send(result + (stats,))
+    connection.close()
+
+
+def solve(cells, size=9, count=None, strategy='mrv', max_set_size=MAX_SET_SIZE, seed=None, deadline=None,
+          max_nodes=None, stats=None):
+    # solves with count runs of plans(), one process each (default: number of CPUs). The first
+    # run to finish wins and the others are stopped at once. Returns the solved board or None;
+    # TimeoutException if every run went past the deadline or max_nodes. stats adds up the work
+    # of the runs that finished, not counted as solves
+    count = count or os.cpu_count() or 1
+    connections = {}
+
+    for plan in plans(count, strategy, seed):
+        reader, writer = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_run, args=(writer, cells, size, plan, max_set_size, deadline,
+                                                             max_nodes), daemon=True)
+        process.start()
+        # only the run writes to it, so the reader sees EOF if the run dies
+        writer.close()
+        connections[reader] = process
+
+    readers = list(connections)
+    processes = list(connections.values())
+    message = None
+    try:
+        while connections:
+            timeout = None if deadline is None else max(0, deadline - monotonic()) + DEADLINE_GRACE
+            ready = wait(list(connections), timeout)
+
+            if not ready:
+                raise TimeoutException('deadline passed in every run')
+
+            for reader in ready:
+                del connections[reader]
+
+                try:
+                    board, message, run_stats = reader.recv()
+                except EOFError:
+                    # the run died without an answer, the others may still have one
+                    continue
+
+                if stats is not None:
+                    # the work of the run, but not its solves and restarts: the caller counts the
+                    # puzzle as one solve
+                    run_stats.solves = 0
+                    stats.add(run_stats)
+
+                if message is None:
+                    return board
+
+        if message is None:
+            raise RuntimeError('every run of the portfolio failed')
+
+        raise TimeoutException(message)
+    finally:
+        # the other runs are of no use anymore. SIGKILL, not SIGTERM: a run forked from a server
+        # process may have inherited its signal handlers, and would shut the server down
+        for process in processes:
+            if process.is_alive():
+                process.kill()
+
+        for process in processes:
+            process.join()
+
+        for reader in readers:
+            reader.close()
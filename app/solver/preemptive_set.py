@@ -1,48 +1,47 @@
-from .errors import ViolationException
+# with 9 values, naked and hidden sets of up to 4 cover every preemptive set
+MAX_SET_SIZE = 4
 
 
 class PreemptiveSetProxy:
-    def __init__(self, board):
-        self.row = 0
-        self.col = 0
-        self.cross_out_occurred = False
+    def __init__(self, board, max_size=MAX_SET_SIZE, observer=None):
         self.failure = False
+        # the most cells (naked sets) or values (hidden sets) a set is searched with
+        self.max_size = max_size
         self.board = board
+        self.topology = board.topology
+        self.popcount = board.masks.popcount
+        self.bits = board.masks.bits
+        # counters for SolveStats: candidates crossed out, useful sets by the size they were found with
+        self.cross_outs = 0
+        self.sizes = [0] * (board.size + 1)
+        self.observer = observer
 
     def find_and_crossout(self, markup, search):
-        preemptive_set = self.find()
+        dirty = self.board.dirty
 
-        try:
-            while not (self.failure or self._cross_out(preemptive_set, markup, search)):
-                preemptive_set = self.find()
-        except ViolationException:
-            return
-
-    def find(self, pair=False):
-        while not self.failure:
-            markup = self.board[9 * self.row + self.col]
-            len_cond = self._len_condition(markup, pair)
+        # only units changed since they were last searched can hold new preemptive sets
+        while dirty:
+            unit = dirty.pop()
 
-            if len_cond:
-                in_row = self._find_in_row(markup, self.row, self.col, pair)
-                if in_row is not None:
-                    self._next_cell()
-                    return in_row
+            for preemptive_set in self._find_in_unit(unit, self.max_size):
+                crossed_out = self._cross_out(preemptive_set, markup, search)
 
-                in_col = self._find_in_col(markup, self.row, self.col, pair)
-                if in_col is not None:
-                    self._next_cell()
-                    return in_col
+                if crossed_out is None:
+                    # violation: the search path is gone, and with it this set
+                    return
 
-                in_box = self._find_in_box(markup, self.row, self.col, pair)
-                if in_box is not None:
-                    self._next_cell()
-                    return in_box
+                if crossed_out:
+                    self.sizes[preemptive_set.size] += 1
+                    # markup first, then come back for the rest of the unit
+                    dirty.add(unit)
+                    return
 
-            self._next_cell()
+        self.failure = True
 
-        if pair:
-            self.failure = False
+    def find(self, pair=False):
+        for unit in range(len(self.topology.units)):
+            for preemptive_set in self._find_in_unit(unit, 2 if pair else self.max_size, hidden=not pair):
+                return preemptive_set
 
     def failed(self):
         failure = self.failure
@@ -50,185 +49,158 @@ class PreemptiveSetProxy:
         return failure
 
     def _cross_out(self, preemptive_set, markup, search):
+        # True if candidates were crossed out, None on a violation
         success = False
+        popcount = self.popcount
+        # the set holds because of the decisions that narrowed down its cells
+        reason = 0
+        for k in preemptive_set.cells:
+            reason |= self.board.reasons[k]
 
-        for cell in preemptive_set.range:
-            row = cell[0]
-            col = cell[1]
+        for k in preemptive_set.range:
+            for val in self.bits[preemptive_set.values]:
+                cell_markup = self.board[k]
 
-            for val in preemptive_set.values:
-                cell_markup = self.board[9 * row + col]
+                if cell_markup & val and popcount[cell_markup] > 1:
+                    if not success:
+                        success = True
 
-                if len(cell_markup) > 1:
-                    try:
-                        cell_markup.remove(val)
-                    except ValueError:
-                        continue
+                        if self.observer is not None:
+                            self.observer.preemptive_set(preemptive_set.found_values, preemptive_set.found_cells)
 
-                    if search.search_path_exists():
-                        search.crossout_append(row, col, val)
+                    cell_markup = self.board.remove(k, val, reason)
+                    self.cross_outs += 1
 
-                    if len(cell_markup) == 1:
-                        if search.search_path_exists():
-                            search.violation_check(row, col)
+                    if self.observer is not None:
+                        self.observer.cross_out(k, val)
 
-                        markup.cell_enqueue(row, col)
+                    if (popcount[cell_markup] == 1 or self.board.dead_units) and search.violation_check(k):
+                        return None
 
-                    self.cross_out_occurred = True
-                    success = True
+                    if popcount[cell_markup] == 1:
+                        markup.cell_enqueue(k)
 
         return success
 
-    def _next_cell(self):
-        self.col += 1
-
-        if self.col == 9:
-            self.col = 0
-            self.row += 1
-
-            if self.row == 9:
-                self.row = 0
-
-                if self.cross_out_occurred:
-                    self.cross_out_occurred = False
-                else:
-                    self.failure = True
-
-    def _find_in_row(self, markup, row, col, pair):
-        cells = [(row, col)]
-        markup_set = set(markup)
-
-        for c in range(9):
-            m = self.board[9 * row + c]
-            len_cond = self._len_condition(m, pair)
-
-            if len_cond and c != col:
-                m_set = set(m)
-
-                if m_set <= markup_set:
-                    cells.append((row, c))
-
-        return self._valid_preemptive_set(markup, cells)
-
-    def _find_in_col(self, markup, row, col, pair):
-        cells = [(row, col)]
-        markup_set = set(markup)
-
-        for r in range(9):
-            m = self.board[9 * r + col]
-            len_cond = self._len_condition(m, pair)
-
-            if len_cond and r != row:
-                m_set = set(m)
-
-                if m_set <= markup_set:
-                    cells.append((r, col))
-
-        return self._valid_preemptive_set(markup, cells)
-
-    def _find_in_box(self, markup, row, col, pair):
-        cells = [(row, col)]
-        markup_set = set(markup)
-        # get index of upper-left cell
-        i = (row // 3) * 3
-        j = (col // 3) * 3
-        # iterate over square
-        for r in range(i, i + 3):
-            for c in range(j, j + 3):
-                m = self.board[9 * r + c]
-                len_cond = self._len_condition(m, pair)
-
-                if len_cond and not (r == row and c == col):
-                    m_set = set(m)
+    def _find_in_unit(self, unit, max_size, hidden=True):
+        board = self.board.cells
+        popcount = self.popcount
+        open_cells = []
+        masks = []
+        for k in self.topology.units[unit]:
+            mask = board[k]
+
+            if popcount[mask] > 1:
+                open_cells.append(k)
+                masks.append(mask)
+
+        # naked sets: as many cells as values between them
+        for chosen, values in self._subsets(masks, min(max_size, len(open_cells) - 1)):
+            preemptive_set = self._valid_preemptive_set(values, self._pick(open_cells, chosen))
+            if preemptive_set is not None:
+                yield preemptive_set
+
+        if not hidden or len(open_cells) <= max_size + 1:
+            return
 
-                    if m_set <= markup_set:
-                        cells.append((r, c))
+        # hidden sets: as many values as cells that can take them. The other cells form a naked
+        # set of the other values, too large to be found above
+        hidden_max = min(max_size, len(open_cells) - max_size - 1)
+        places = self.board.places
+        offset = self.board.size * unit - 1
+        # the place counts of the board tell which open values have few enough cells left
+        positions = []
+        position_bits = []
+        for val in self.board.masks.values[self._union(masks)]:
+            if places[offset + val] <= hidden_max:
+                bit = 1 << (val - 1)
+                positions.append(sum(1 << i for i, mask in enumerate(masks) if mask & bit))
+                position_bits.append(bit)
+
+        others_max = (1 << len(open_cells)) - 1
+        for chosen, cells in self._subsets(positions, hidden_max):
+            others = self._pick(open_cells, others_max ^ cells)
+            hidden = self._union(self._pick(position_bits, chosen)), self._pick(open_cells, cells)
+            preemptive_set = self._valid_preemptive_set(self._union(board[k] for k in others), others, hidden)
+            if preemptive_set is not None:
+                yield preemptive_set
+
+    def _subsets(self, masks, max_size):
+        # the sets of up to max_size masks with as many bits as masks between them: a bit mask of
+        # their indices and their union. A union that grows past max_size is not extended
+        popcount = self.popcount
+        items = [(1 << i, mask) for i, mask in enumerate(masks) if 0 < popcount[mask] <= max_size]
+        subsets = []
+        # depth first: the masks chosen so far, how many, their union and the next mask to try
+        stack = [(0, 0, 0, 0)]
+
+        while stack:
+            chosen, count, union, start = stack.pop()
+            count += 1
+
+            for j in range(start, len(items)):
+                index, mask = items[j]
+                extended = union | mask
+                extended_len = popcount[extended]
+
+                if extended_len == count:
+                    subsets.append((chosen | index, extended))
+                elif extended_len <= max_size and extended_len - count < len(items) - j:
+                    # enough masks left to fill up the union
+                    stack.append((chosen | index, count, extended, j + 1))
+
+        return subsets
 
-        return self._valid_preemptive_set(markup, cells)
+    @staticmethod
+    def _pick(items, chosen):
+        return [item for i, item in enumerate(items) if chosen >> i & 1]
 
     @staticmethod
-    def _len_condition(markup, pair):
-        if pair:
-            return len(markup) == 2
+    def _union(masks):
+        union = 0
+        for mask in masks:
+            union |= mask
 
-        return len(markup) > 1
+        return union
 
-    def _valid_preemptive_set(self, markup, cells):
-        if len(markup) == len(cells):
-            return PreemptiveSet(self.board, markup, cells)
+    def _valid_preemptive_set(self, markup, cells, hidden=None):
+        if self.popcount[markup] == len(cells):
+            return PreemptiveSet(self.board, markup, cells, hidden)
 
 
 class PreemptiveSet:
-    def __init__(self, board, values, cells):
+    def __init__(self, board, values, cells, hidden=None):
+        # values and cells are crossed out as a naked set; a hidden set is found as the values
+        # and cells of hidden, the other cells of the unit
         self.board = board
         self.values = values
         self.cells = cells
+        # the set as it was found, a naked one or a hidden one
+        self.found_values, self.found_cells = (values, cells) if hidden is None else hidden
+        self.size = len(self.found_cells)
         self.range = self._range()
 
     def _range(self):
         range_full = []
-        # get row index of first cell
-        row1 = self.cells[0][0]
-        range_full.extend(self._range_row(row1))
-        # get column index of first cell
-        col1 = self.cells[0][1]
-        range_full.extend(self._range_col(col1))
-        range_full.extend(self._range_box(row1, col1))
+        # check row, column and box of first cell
+        for unit in self.board.topology.cell_units[self.cells[0]]:
+            range_full.extend(self._range_unit(unit))
 
         return range_full
 
-    def _range_row(self, row):
-        range_row = []
-
-        for k in range(1, len(self.cells)):
-            r = self.cells[k][0]
-
-            if r != row:
-                return range_row
-
-        for col in range(9):
-            self._range_append_cell(range_row, row, col)
-
-        return range_row
-
-    def _range_col(self, col):
-        range_col = []
+    def _range_unit(self, unit):
+        range_unit = []
 
-        for k in range(1, len(self.cells)):
-            c = self.cells[k][1]
-
-            if c != col:
-                return range_col
-
-        for row in range(9):
-            self._range_append_cell(range_col, row, col)
-
-        return range_col
-
-    def _range_box(self, row, col):
-        # get index of upper-left cell
-        i = (row // 3) * 3
-        j = (col // 3) * 3
-
-        range_box = []
+        topology = self.board.topology
+        popcount = self.board.masks.popcount
 
         # check all other cells
         for k in range(1, len(self.cells)):
-            r = self.cells[k][0]
-            c = self.cells[k][1]
-
-            if not (r in range(i, i + 3) and c in range(j, j + 3)):
-                return range_box
-
-        for r in range(i, i + 3):
-            for c in range(j, j + 3):
-                self._range_append_cell(range_box, r, c)
-
-        return range_box
+            if unit not in topology.cell_units[self.cells[k]]:
+                return range_unit
 
-    def _range_append_cell(self, range_list, row, col):
-        cell = row, col
-        markup = self.board[9 * row + col]
+        for c in topology.units[unit]:
+            if popcount[self.board.cells[c]] > 1 and c not in self.cells:
+                range_unit.append(c)
 
-        if len(markup) > 1 and cell not in self.cells:
-            range_list.append(cell)
+        return range_unit
@@ -1,31 +1,69 @@
-import copy
+import random
+
+from math import isqrt
+from time import monotonic, perf_counter
 
 from .backtrack_search import BacktrackSearch
-from .errors import NoSolutionException
+from .board import Board
+from .branching import branching_strategy
+from .dlx import DancingLinks
+from .errors import NoSolutionException, TimeoutException
 from .markup import Markup
-from .preemptive_set import PreemptiveSetProxy
+from .preemptive_set import MAX_SET_SIZE, PreemptiveSetProxy
+from .stats import SolveStats
+
+
+# one character per cell in the string and file formats: '0' (or '.') for an empty
+# cell, then 1-9 and A-P for the digits 10 to 25 of the larger boards
+CHARS = '0123456789ABCDEFGHIJKLMNOP'
+CHAR_VALUES = dict(
+    [(char, val) for val, char in enumerate(CHARS)]
+    + [(char.lower(), val) for val, char in enumerate(CHARS)]
+    + [('.', 0)]
+)
+# boards accepted by iter_strings
+BOARD_SIZES = (9, 16, 25)
+# crook: markup, preemptive sets and backtrack search; dlx: exact cover by Dancing Links
+ENGINES = ('crook', 'dlx')
 
 
 class SolverIO:
+    @staticmethod
+    def char_value(char, size):
+        val = CHAR_VALUES.get(char)
+
+        if val is None or val > size:
+            raise ValueError('bad cell for a {0}x{0} board: {1!r}'.format(size, char))
+
+        return val
+
+    @staticmethod
+    def board_size(puzzle):
+        # size of the board of a puzzle given as a sequence of all its cells
+        size = isqrt(len(puzzle))
+
+        if size * size != len(puzzle):
+            raise ValueError('expected a square number of cells, found {}'.format(len(puzzle)))
+
+        return size
+
     @staticmethod
     def from_file(filein):
-        cells = []
-        for row in range(9):
-            line = filein[row]
-            for col in range(9):
-                val = int(line[col])
-                if val != 0:
-                    cell = row, col, val
-                    cells.append(cell)
+        # the first puzzle of the lines of a file, one line per row or all on one line
+        str_puzzle = next(SolverIO.iter_strings(filein), None)
 
-        return cells
+        if str_puzzle is None:
+            raise ValueError('no puzzle')
+
+        return SolverIO.from_string(str_puzzle)
 
     @staticmethod
     def from_list(str_puzzle):
         cells = []
-        for row in range(9):
-            for col in range(9):
-                index = row * 9 + col
+        size = SolverIO.board_size(str_puzzle)
+        for row in range(size):
+            for col in range(size):
+                index = row * size + col
                 val = str_puzzle[index]
                 if val != '':
                     cell = row, col, int(val)
@@ -44,69 +82,259 @@ class SolverIO:
 
         return str_puzzle
 
+    @staticmethod
+    def from_string(str_puzzle):
+        # one character per cell, see CHARS
+        cells = []
+        size = SolverIO.board_size(str_puzzle)
+        for index, char in enumerate(str_puzzle):
+            val = SolverIO.char_value(char, size)
+            if val != 0:
+                cell = index // size, index % size, val
+                cells.append(cell)
+
+        return cells
+
+    @staticmethod
+    def to_string(int_puzzle):
+        return ''.join(CHARS[i] for i in int_puzzle)
+
+    @staticmethod
+    def iter_strings(lines, errors=False):
+        # reads puzzles lazily, either one per line or one line per row; with errors, a malformed
+        # puzzle does not end the input but is yielded as ValueError(message, text) in its place
+        rows = []
+        # the first error in the rows read so far, reported once their puzzle is complete
+        error = None
+        for line_no, line in enumerate(lines, 1):
+            line = line.strip()
+
+            if not line:
+                continue
+
+            whole = any(len(line) == size * size for size in BOARD_SIZES)
+
+            if rows and whole:
+                # a puzzle on one line: the rows before it are an incomplete puzzle
+                message = 'incomplete puzzle before line {}: {} of {} rows'.format(line_no, len(rows), len(rows[0]))
+
+                if not errors:
+                    raise ValueError(message)
+
+                yield ValueError(error or message, ''.join(rows))
+                rows.clear()
+                error = None
+
+            if not rows and whole:
+                yield line
+                continue
+
+            if len(line) in BOARD_SIZES and (not rows or len(line) == len(rows[0])):
+                rows.append(line)
+            elif rows:
+                message = 'line {}: expected a row of {} characters, found {}'.format(line_no, len(rows[0]), len(line))
+
+                if not errors:
+                    raise ValueError(message)
+
+                # the damaged row still counts, so that the rows after it line up with their puzzle
+                error = error or message
+                rows.append(line)
+            else:
+                message = 'line {}: expected a puzzle or a row of {} characters, found {}'.format(
+                    line_no, ' or '.join(map(str, BOARD_SIZES)), len(line))
+
+                if not errors:
+                    raise ValueError(message)
+
+                yield ValueError(message, line)
+                continue
+
+            if len(rows) == len(rows[0]):
+                yield ''.join(rows) if error is None else ValueError(error, ''.join(rows))
+                rows.clear()
+                error = None
+
+        if rows:
+            message = 'incomplete puzzle: {} of {} rows'.format(len(rows), len(rows[0]))
+
+            if not errors:
+                raise ValueError(message)
+
+            yield ValueError(error or message, ''.join(rows))
+
 
 class Solver:
-    def __init__(self, cells):
-        self.board = [list(range(1, 10)) for i in range(9 ** 2)]
-
-        for e in cells:
-            row = e[0]
-            col = e[1]
-            val = e[2]
-            self.board[9 * row + col] = [val]
-
-    def solve(self):
-        markup = Markup(self.board)
-        preemptive_set = PreemptiveSetProxy(self.board)
-        search = BacktrackSearch(self.board, markup, preemptive_set)
-        # step 1: find all forced numbers in the puzzle
-        markup.forced_numbers(search)
-        # step 2: markup the puzzle
-        markup.markup(search)
-        # step 3: iteratively search for preemptive sets (or make a random choice)
-        while not self._solved():
-            # find preemptive set and cross out
-            preemptive_set.find_and_crossout(markup, search)
-            # generate search path on the fly
-            if preemptive_set.failed():
-                try:
-                    search.position()
-                except NoSolutionException:
-                    return False
+    def __init__(self, cells, strategy='mrv', stats=None, size=9, max_set_size=MAX_SET_SIZE, observer=None,
+                 engine='crook', seed=None, portfolio=0):
+        if engine not in ENGINES:
+            raise ValueError('unknown engine: {}'.format(engine))
+
+        self.engine = engine
+        self.size = size
+        self.givens = cells
+        # dlx keeps its own links: strategy, max_set_size, observer, seed and portfolio are only for crook
+        if engine == 'dlx':
+            self.links = DancingLinks(cells, size)
+        else:
+            self.board = Board(cells, size)
+        # the solved board, when it does not come from self.board
+        self.solution = None
+        self.strategy = strategy
+        self.max_set_size = max_set_size
+        self.nodes = 0
+        self.stats = SolveStats() if stats is None else stats
+        # an Observer of the search events, see observer.py
+        self.observer = observer
+        # seeds the choice among equally good cells to branch on, None for the first of them
+        self.seed = seed
+        # runs of the solver in parallel processes once a solve takes long, 0 for none: see portfolio.py
+        self.portfolio = portfolio
+
+    def solve(self, deadline=None, max_nodes=None):
+        # deadline is a time.monotonic() value; past it, or past max_nodes search nodes,
+        # TimeoutException is raised
+        if self.portfolio and self.engine == 'crook':
+            return self._solve_portfolio(deadline, max_nodes)
+
+        return len(self._search(1, deadline, max_nodes)) == 1
+
+    def _solve_portfolio(self, deadline, max_nodes):
+        # imported here, the portfolio is made of solvers
+        from .portfolio import PORTFOLIO_AFTER, solve
+
+        # most puzzles take the plain search a few nodes, not worth starting processes for
+        limit = PORTFOLIO_AFTER if max_nodes is None else min(PORTFOLIO_AFTER, max_nodes)
+        try:
+            return len(self._search(1, deadline, limit)) == 1
+        except TimeoutException:
+            if limit == max_nodes or (deadline is not None and monotonic() > deadline):
+                raise
+
+        nodes = self.stats.nodes
+        try:
+            self.solution = solve(self.givens, self.size, self.portfolio, self.strategy, self.max_set_size,
+                                  self.seed, deadline, max_nodes, self.stats)
+        finally:
+            self.nodes += self.stats.nodes - nodes
+
+        return self.solution is not None
 
-                search.search()
+    def count_solutions(self, limit=2, deadline=None, max_nodes=None):
+        # returns the number of solutions, up to limit, and the solutions themselves
+        solutions = self._search(limit, deadline, max_nodes)
+        return len(solutions), solutions
 
-            # update markup
+    def _search(self, limit, deadline, max_nodes):
+        if self.engine == 'dlx':
+            return self._search_dlx(limit, deadline, max_nodes)
+
+        solutions = []
+        markup = Markup(self.board, self.observer)
+        preemptive_set = PreemptiveSetProxy(self.board, self.max_set_size, self.observer)
+        rng = None if self.seed is None else random.Random(self.seed)
+        strategy = branching_strategy(self.strategy, self.board, preemptive_set, rng)
+        search = BacktrackSearch(self.board, markup, strategy, self.observer)
+        seconds = self.stats.seconds
+        start = now = perf_counter()
+        try:
+            # a value without a place in some unit from the start
+            if self.board.dead():
+                raise NoSolutionException('contradiction in the puzzle')
+            # a digit given twice in a row, column or box
+            if self.board.clash():
+                raise NoSolutionException('repeated digit in the puzzle')
+
+            # step 1: find all forced numbers in the puzzle
+            markup.forced_numbers(search)
+            now = perf_counter()
+            seconds['forced_numbers'] += now - start
+            # step 2: markup the puzzle
             markup.markup(search)
+            start, now = now, perf_counter()
+            seconds['markup'] += now - start
+            # step 3: iteratively search for preemptive sets (or make a random choice)
+            while True:
+                if self._solved():
+                    if self.board.consistent():
+                        solutions.append(self.get_board())
 
-        return True
+                        if self.observer is not None:
+                            self.observer.solution()
 
-    def _solved(self):
-        for row in range(9):
-            for col in range(9):
-                if len(self.board[9 * row + col]) != 1:
-                    return False
+                    if len(solutions) >= limit or not search.search_path_exists():
+                        break
+
+                    # a solution is a dead end too: go on with the next choice
+                    search.delete_search_path()
+                    search.violation_occurred = True
+                    continue
+
+                # after a violation, retry the next choice of the current search path
+                if not search.violation_occurred:
+                    # find preemptive set and cross out
+                    preemptive_set.find_and_crossout(markup, search)
+                    start, now = now, perf_counter()
+                    seconds['preemptive_sets'] += now - start
+                # generate search path on the fly
+                if search.violation_occurred or preemptive_set.failed():
+                    search.position()
+                    search.search()
+                    start, now = now, perf_counter()
+                    seconds['search'] += now - start
+
+                    if max_nodes is not None and search.nodes > max_nodes:
+                        raise TimeoutException('more than {} search nodes'.format(max_nodes))
+                    if deadline is not None and monotonic() > deadline:
+                        raise TimeoutException('deadline passed after {} search nodes'.format(search.nodes))
+
+                # update markup
+                markup.markup(search)
+                start, now = now, perf_counter()
+                seconds['markup'] += now - start
 
-        return True
+        except NoSolutionException:
+            pass
+
+        finally:
+            self.nodes = search.nodes
+            self.stats.collect(markup, preemptive_set, search)
+
+        return solutions
+
+    def _search_dlx(self, limit, deadline, max_nodes):
+        start = perf_counter()
+        try:
+            solutions = self.links.search(limit, deadline, max_nodes)
+        finally:
+            self.nodes = self.links.nodes
+            self.stats.seconds['search'] += perf_counter() - start
+            self.stats.collect_dlx(self.links)
+
+        if solutions:
+            self.solution = solutions[0]
+
+        return solutions
+
+    def _solved(self):
+        return self.board.solved()
 
     def get_board(self):
-        board = copy.deepcopy(self.board)
+        if self.solution is not None:
+            return list(self.solution)
 
-        for i in range(9):
-            for j in range(9):
-                k = 9 * i + j
-                if len(board[k]) == 1:
-                    board[k] = board[k][0]
-                else:
-                    board[k] = 0
+        if self.engine == 'dlx':
+            # the givens, no solution was found
+            return list(self.links.grid)
 
-        return board
+        return self.board.digits()
 
     def __str__(self):
         board = self.get_board()
         to_str = str()
 
-        for i in range(9):
-            to_str += str(board[9 * i: 9 * i + 9]) + '\n'
+        size = self.size
+        for i in range(size):
+            to_str += str(board[size * i: size * i + size]) + '\n'
 
         return to_str
@@ -0,0 +1,81 @@
+PHASES = ('forced_numbers', 'markup', 'preemptive_sets', 'search')
+
+
+class SolveStats:
+    __slots__ = (
+        'solves', 'forced_numbers', 'markup_passes', 'cross_outs', 'preemptive_sets',
+        'search_paths', 'nodes', 'violations', 'backtracks', 'backjumps', 'nogood_hits', 'max_depth',
+        'seconds',
+    )
+
+    def __init__(self):
+        # counters add up over all solves collected
+        self.solves = 0
+        self.forced_numbers = 0
+        self.markup_passes = 0
+        self.cross_outs = 0
+        # preemptive sets that crossed out candidates, by size: cells of a naked set, values of a hidden one
+        self.preemptive_sets = {}
+        self.search_paths = 0
+        self.nodes = 0
+        self.violations = 0
+        self.backtracks = 0
+        # search paths jumped over after a conflict, choices refuted by a learned nogood
+        self.backjumps = 0
+        self.nogood_hits = 0
+        self.max_depth = 0
+        # wall time per phase
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+
+    def collect(self, markup, preemptive_set, search):
+        self.solves += 1
+        self.forced_numbers += markup.forced
+        self.markup_passes += markup.passes
+        self.cross_outs += markup.cross_outs + preemptive_set.cross_outs
+        for size, count in enumerate(preemptive_set.sizes):
+            if count:
+                self.preemptive_sets[size] = self.preemptive_sets.get(size, 0) + count
+        self.search_paths += search.paths_created
+        self.nodes += search.nodes
+        self.violations += search.violations
+        self.backtracks += search.backtracks
+        self.backjumps += search.backjumps
+        self.nogood_hits += search.nogood_hits
+        self.max_depth = max(self.max_depth, search.max_depth)
+
+    def collect_dlx(self, links):
+        # a solve by the exact cover engine: search only
+        self.solves += 1
+        self.search_paths += links.paths_created
+        self.nodes += links.nodes
+        self.violations += links.violations
+        self.backtracks += links.backtracks
+        self.max_depth = max(self.max_depth, links.max_depth)
+
+    def add(self, other):
+        # the stats of solves collected elsewhere, e.g. in another process
+        for name in ('solves', 'forced_numbers', 'markup_passes', 'cross_outs', 'search_paths', 'nodes',
+                     'violations', 'backtracks', 'backjumps', 'nogood_hits'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for size, count in other.preemptive_sets.items():
+            self.preemptive_sets[size] = self.preemptive_sets.get(size, 0) + count
+        self.max_depth = max(self.max_depth, other.max_depth)
+        for phase, seconds in other.seconds.items():
+            self.seconds[phase] += seconds
+
+    def as_dict(self):
+        return dict(
+            solves=self.solves,
+            forced_numbers=self.forced_numbers,
+            markup_passes=self.markup_passes,
+            cross_outs=self.cross_outs,
+            preemptive_sets={str(size): count for size, count in sorted(self.preemptive_sets.items())},
+            search_paths=self.search_paths,
+            nodes=self.nodes,
+            violations=self.violations,
+            backtracks=self.backtracks,
+            backjumps=self.backjumps,
+            nogood_hits=self.nogood_hits,
+            max_depth=self.max_depth,
+            seconds=dict(self.seconds),
+        )
@@ -0,0 +1,118 @@
+import argparse
+import fileinput
+import os
+import sqlite3
+import sys
+
+from .canonical import canonicalize
+from .stream import chunks, solve_all
+from .solver import SolverIO
+
+# stands for "no solution" in the solution column
+NO_SOLUTION = b''
+
+
+class SolutionStore:
+    def __init__(self, path, max_size=1000000):
+        self.path = path
+        self.max_size = max_size
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        # sqlite connections must not cross a fork, so every process opens its own
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS solutions ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'puzzle BLOB NOT NULL UNIQUE, '
+                'solution BLOB NOT NULL)'
+            )
+            self._connection = connection
+            self._pid = os.getpid()
+
+        return self._connection
+
+    def get(self, puzzle):
+        # puzzle and solution are bytes of 81 digits; returns None if unknown
+        row = self._connect().execute(
+            'SELECT solution FROM solutions WHERE puzzle = ?', (puzzle,)
+        ).fetchone()
+
+        return None if row is None else row[0]
+
+    def put(self, puzzle, solution):
+        self.put_many([(puzzle, solution)])
+
+    def put_many(self, items):
+        connection = self._connect()
+
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(
+                'INSERT OR IGNORE INTO solutions (puzzle, solution) VALUES (?, ?)', items
+            )
+            # oldest entries go first once the store is full
+            connection.execute(
+                'DELETE FROM solutions WHERE id <= (SELECT MAX(id) FROM solutions) - ?',
+                (self.max_size,)
+            )
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM solutions').fetchone()[0]
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def warm(store, str_puzzles, strategy='mrv', jobs=1, chunk_size=64):
+    # solves a corpus into the store, returns the number of puzzles read
+    count = 0
+
+    for results in chunks(solve_all(str_puzzles, strategy, jobs, chunk_size), 1000):
+        items = []
+
+        for str_puzzle, solution, nodes in results:
+            # the canonical form is only defined for 9x9 boards
+            if len(str_puzzle) != 81:
+                continue
+
+            canonical, transform = canonicalize([int(val) for val in str_puzzle.replace('.', '0')])
+
+            if solution is None:
+                items.append((bytes(canonical), NO_SOLUTION))
+            else:
+                items.append((bytes(canonical), bytes(transform.apply([int(val) for val in solution]))))
+
+        store.put_many(items)
+        count += len(results)
+
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 -m app.solver.store')
+    parser.add_argument('store', help='path of the solution store')
+    parser.add_argument('files', nargs='*', help='puzzles to solve into the store (default: stdin)')
+    parser.add_argument('--max-size', type=int, default=1000000,
+                        help='solutions kept in the store (default: 1000000)')
+    parser.add_argument('--jobs', type=int, default=1, help='solver processes (default: 1)')
+    args = parser.parse_args()
+
+    store = SolutionStore(args.store, args.max_size)
+
+    try:
+        count = warm(store, SolverIO.iter_strings(fileinput.input(args.files)), jobs=args.jobs)
+    except ValueError as e:
+        sys.exit('error: {}'.format(e))
+
+    print('{} puzzles read, {} solutions stored'.format(count, len(store)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import collections
+import itertools
+import json
+
+from concurrent.futures import ProcessPoolExecutor
+from .solver import Solver, SolverIO
+
+
+def solve_string(str_puzzle, strategy, engine='crook'):
+    solver = Solver(SolverIO.from_string(str_puzzle), strategy=strategy, size=SolverIO.board_size(str_puzzle),
+                    engine=engine)
+
+    if not solver.solve():
+        return str_puzzle, None, solver.nodes
+
+    return str_puzzle, SolverIO.to_string(solver.get_board()), solver.nodes
+
+
+def count_string(str_puzzle, strategy, limit, engine='crook'):
+    solver = Solver(SolverIO.from_string(str_puzzle), strategy=strategy, size=SolverIO.board_size(str_puzzle),
+                    engine=engine)
+    count, solutions = solver.count_solutions(limit)
+
+    return str_puzzle, count, [SolverIO.to_string(solution) for solution in solutions], solver.nodes
+
+
+def check_chunk(str_puzzles):
+    # the indices of the well-formed puzzles, and ValueError(message, puzzle) in place of the others
+    indices = []
+    results = [None] * len(str_puzzles)
+
+    for index, str_puzzle in enumerate(str_puzzles):
+        if isinstance(str_puzzle, ValueError):
+            # malformed already when read
+            results[index] = str_puzzle
+            continue
+
+        try:
+            SolverIO.from_string(str_puzzle)
+        except ValueError as e:
+            results[index] = ValueError(str(e), str_puzzle)
+            continue
+
+        indices.append(index)
+
+    return indices, results
+
+
+def solve_chunk(str_puzzles, strategy, count=None, vectorized=False, engine='crook', errors=False):
+    # with errors, a malformed puzzle gets a ValueError in place of its result instead of failing
+    # the whole chunk
+    if errors:
+        indices, results = check_chunk(str_puzzles)
+        chunk = [str_puzzles[index] for index in indices]
+
+        for index, result in zip(indices, solve_chunk(chunk, strategy, count, vectorized, engine)):
+            results[index] = result
+
+        return results
+
+    if count is not None:
+        return [count_string(str_puzzle, strategy, count, engine) for str_puzzle in str_puzzles]
+
+    if vectorized:
+        # imported here, numpy is optional
+        from .vectorized import solve_strings
+        return solve_strings(str_puzzles, strategy, engine)
+
+    return [solve_string(str_puzzle, strategy, engine) for str_puzzle in str_puzzles]
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    chunk = list(itertools.islice(iterator, size))
+
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(iterator, size))
+
+
+def solve_all(str_puzzles, strategy='mrv', jobs=1, chunk_size=64, count=None, vectorized=False, engine='crook',
+              errors=False):
+    # yields (puzzle, solution or None, nodes) in input order, or
+    # (puzzle, number of solutions, solutions, nodes) with count, the most solutions to look for;
+    # vectorized propagates a whole chunk at a time before searching; with errors, a malformed
+    # puzzle yields ValueError(message, puzzle) instead of stopping the run
+    if jobs == 1:
+        for chunk in chunks(str_puzzles, chunk_size if vectorized else 1):
+            yield from solve_chunk(chunk, strategy, count, vectorized, engine, errors)
+        return
+
+    with ProcessPoolExecutor(jobs) as pool:
+        pending = collections.deque()
+
+        for chunk in chunks(str_puzzles, chunk_size):
+            pending.append(pool.submit(solve_chunk, chunk, strategy, count, vectorized, engine, errors))
+
+            # stop reading input until the oldest chunk is written out
+            if len(pending) >= 2 * jobs:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
+def format_error(error, output_format):
+    message, str_puzzle = error.args
+
+    if output_format == 'json':
+        return json.dumps(dict(puzzle=str_puzzle, error=message))
+
+    # same as a puzzle without a solution
+    return ''
+
+
+def format_result(result, output_format):
+    if isinstance(result, ValueError):
+        return format_error(result, output_format)
+
+    str_puzzle, solution, nodes = result
+
+    if output_format == 'json':
+        return json.dumps(dict(puzzle=str_puzzle, solution=solution, nodes=nodes))
+
+    # one solution per line, an empty line if there is none
+    return solution or ''
+
+
+def format_count(result, output_format):
+    if isinstance(result, ValueError):
+        return format_error(result, output_format)
+
+    str_puzzle, count, solutions, nodes = result
+
+    if output_format == 'json':
+        return json.dumps(dict(puzzle=str_puzzle, count=count, solutions=solutions, nodes=nodes))
+
+    # the number of solutions found
+    return str(count)
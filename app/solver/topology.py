@@ -0,0 +1,43 @@
+from functools import lru_cache
+
+
+class Topology:
+    def __init__(self, box):
+        # a board of box * box units of box * box cells each
+        size = box * box
+        self.box = box
+        self.size = size
+
+        # cells are indexed by size * row + col
+        self.cells = tuple(range(size * size))
+
+        # units are the rows, the columns and the boxes, in this order
+        self.rows = tuple(tuple(size * row + col for col in range(size)) for row in range(size))
+        self.cols = tuple(tuple(size * row + col for row in range(size)) for col in range(size))
+        self.boxes = tuple(
+            tuple(size * (i + r) + j + c for r in range(box) for c in range(box))
+            for i in range(0, size, box) for j in range(0, size, box)
+        )
+        self.units = self.rows + self.cols + self.boxes
+
+        # indices into units of the row, column and box containing each cell
+        self.cell_units = tuple(
+            (k // size, size + k % size, 2 * size + (k // (size * box)) * box + (k % size) // box)
+            for k in self.cells
+        )
+        self.peers = tuple(self._peers(k) for k in self.cells)
+
+    def _peers(self, k):
+        peers = []
+        # row first, then column, then the rest of the box
+        for unit in self.cell_units[k]:
+            for cell in self.units[unit]:
+                if cell != k and cell not in peers:
+                    peers.append(cell)
+
+        return tuple(peers)
+
+
+@lru_cache(maxsize=None)
+def topology(box):
+    return Topology(box)
@@ -0,0 +1,313 @@
+import argparse
+import fileinput
+import struct
+import sys
+
+from .board import mask_tables
+from .branching import STRATEGIES
+from .observer import Observer
+from .solver import CHARS, Solver, SolverIO
+
+# a trace file: the header, the puzzle as one byte per cell (0 for empty), then the events,
+# each a byte for its kind and its fields, little endian
+MAGIC = b'SDKT'
+VERSION = 1
+HEADER = struct.Struct('<4sBB')
+
+CROSS_OUT, PREEMPTIVE_SET, PATH_OPENED, VIOLATION, BACKTRACK, SOLUTION = range(1, 7)
+# fields after the kind: cells are 16 bits, candidate masks 32 (25x25 boards)
+EVENTS = {
+    CROSS_OUT: ('cross_out', struct.Struct('<HI')),
+    PREEMPTIVE_SET: ('preemptive_set', struct.Struct('<IB')),
+    PATH_OPENED: ('path_opened', struct.Struct('<HI')),
+    VIOLATION: ('violation', struct.Struct('<H')),
+    BACKTRACK: ('backtrack', struct.Struct('<H')),
+    SOLUTION: ('solution', struct.Struct('<')),
+}
+CELL = struct.Struct('<H')
+
+# bytes buffered before a write to the file
+BUFFER_SIZE = 1 << 16
+
+
+class TraceRecorder(Observer):
+    def __init__(self, fileout, str_puzzle):
+        # fileout is a binary file, written as the buffer fills up and on close
+        self.fileout = fileout
+        size = SolverIO.board_size(str_puzzle)
+        self.buffer = bytearray(HEADER.pack(MAGIC, VERSION, size))
+        self.buffer += bytes(SolverIO.char_value(char, size) for char in str_puzzle)
+        self.events = 0
+
+    def _event(self, kind, *fields):
+        self.buffer.append(kind)
+        self.buffer += EVENTS[kind][1].pack(*fields)
+        self.events += 1
+
+        if len(self.buffer) >= BUFFER_SIZE:
+            self.flush()
+
+    def cross_out(self, k, bits):
+        self._event(CROSS_OUT, k, bits)
+
+    def preemptive_set(self, values, cells):
+        self._event(PREEMPTIVE_SET, values, len(cells))
+        for k in cells:
+            self.buffer += CELL.pack(k)
+
+    def path_opened(self, k, choices):
+        self._event(PATH_OPENED, k, choices)
+
+    def violation(self, k):
+        self._event(VIOLATION, k)
+
+    def backtrack(self, k):
+        self._event(BACKTRACK, k)
+
+    def solution(self):
+        self._event(SOLUTION)
+
+    def flush(self):
+        self.fileout.write(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self.fileout.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_trace(data):
+    # returns the puzzle, as a list of digits, and the events in order: (name, fields...),
+    # a preemptive set with its values and the tuple of its cells
+    if len(data) < HEADER.size:
+        raise ValueError('not a trace: {} bytes'.format(len(data)))
+
+    magic, version, size = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a version {} trace'.format(VERSION))
+
+    offset = HEADER.size + size * size
+    if len(data) < offset:
+        raise ValueError('truncated trace: no puzzle')
+
+    return list(data[HEADER.size:offset]), _events(data, offset)
+
+
+def _events(data, offset):
+    while offset < len(data):
+        kind = data[offset]
+        if kind not in EVENTS:
+            raise ValueError('bad event {} at byte {}'.format(kind, offset))
+
+        name, fields = EVENTS[kind]
+        try:
+            event = (name,) + fields.unpack_from(data, offset + 1)
+        except struct.error:
+            raise ValueError('truncated event at byte {}'.format(offset))
+
+        offset += 1 + fields.size
+
+        if kind == PREEMPTIVE_SET:
+            values, count = event[1:]
+            end = offset + CELL.size * count
+            if end > len(data):
+                raise ValueError('truncated event at byte {}'.format(offset))
+
+            event = name, values, tuple(k for k, in CELL.iter_unpack(data[offset:end]))
+            offset = end
+
+        yield event
+
+
+def record(str_puzzle, fileout, strategy='mrv', limit=1):
+    # solves the puzzle with a recorder attached, returns the solver
+    solver = Solver(SolverIO.from_string(str_puzzle), strategy=strategy, size=SolverIO.board_size(str_puzzle))
+
+    with TraceRecorder(fileout, str_puzzle) as recorder:
+        solver.observer = recorder
+        solver.count_solutions(limit)
+
+    return solver
+
+
+class Replay:
+    # the candidates of every cell along the events of a trace
+    def __init__(self, digits):
+        self.size = SolverIO.board_size(digits)
+        self.masks = mask_tables(self.size)
+        self.cells = [1 << (val - 1) if val else self.masks.all for val in digits]
+        # per open search path: its cell, choices, the index of the one tried and the board before
+        self.paths = []
+        self.restore = False
+
+    def apply(self, event):
+        # True if the search went on with the next choice of a path before the event
+        name = event[0]
+        next_choice = False
+
+        # a violation or solution gives up the current choice, once the backtracks are read
+        if self.restore and name != 'backtrack':
+            self.restore = False
+
+            if self.paths:
+                path = self.paths[-1]
+                path[2] += 1
+                self.cells = list(path[3])
+                next_choice = True
+
+        if name == 'cross_out':
+            k, bits = event[1:]
+            self.cells[k] &= ~bits
+        elif name == 'path_opened':
+            k, choices = event[1:]
+            self.paths.append([k, self.masks.values[choices], 0, list(self.cells)])
+        elif name in ('violation', 'solution'):
+            self.restore = True
+        elif name == 'backtrack' and self.paths:
+            self.paths.pop()
+
+        return next_choice
+
+    def describe(self, event):
+        name = event[0]
+
+        if name == 'cross_out':
+            return 'cross out {} from {}'.format(self._values(event[2]), self._cell(event[1]))
+        if name == 'preemptive_set':
+            return 'preemptive set {} in {}'.format(self._values(event[1]), ' '.join(map(self._cell, event[2])))
+        if name == 'path_opened':
+            return 'branch on {}: {}'.format(self._cell(event[1]), self._values(event[2]))
+        if name in ('violation', 'backtrack'):
+            return '{} at {}'.format(name, self._cell(event[1]))
+
+        return name
+
+    def choice(self):
+        # what the search tries now
+        k, choices, index, cells = self.paths[-1]
+        return 'try {} = {}'.format(self._cell(k), CHARS[choices[index]])
+
+    def board(self):
+        digit = self.masks.digit
+        return '\n'.join(
+            ''.join(CHARS[digit[mask]] for mask in self.cells[self.size * row:self.size * (row + 1)])
+            for row in range(self.size)
+        )
+
+    def _cell(self, k):
+        return 'r{}c{}'.format(k // self.size + 1, k % self.size + 1)
+
+    def _values(self, mask):
+        return ''.join(CHARS[val] for val in self.masks.values[mask])
+
+
+def summarize(digits, events):
+    size = SolverIO.board_size(digits)
+    counts = dict.fromkeys((name for name, fields in EVENTS.values()), 0)
+    set_sizes = {}
+    branched = {}
+    # violations by search depth
+    depths = {}
+    depth = max_depth = 0
+
+    for event in events:
+        name = event[0]
+        counts[name] += 1
+
+        if name == 'preemptive_set':
+            set_sizes[len(event[2])] = set_sizes.get(len(event[2]), 0) + 1
+        elif name == 'path_opened':
+            depth += 1
+            max_depth = max(max_depth, depth)
+            branched[event[1]] = branched.get(event[1], 0) + 1
+        elif name == 'violation':
+            depths[depth] = depths.get(depth, 0) + 1
+        elif name == 'backtrack':
+            depth -= 1
+
+    lines = ['{0}x{0} puzzle, {1} clues'.format(size, sum(1 for val in digits if val))]
+    lines.extend('{}: {}'.format(name, count) for name, count in counts.items())
+    lines.append('preemptive sets by size: {}'.format(
+        ', '.join('{}: {}'.format(n, set_sizes[n]) for n in sorted(set_sizes)) or '-'))
+    lines.append('max depth: {}'.format(max_depth))
+    lines.append('violations by depth: {}'.format(
+        ', '.join('{}: {}'.format(d, depths[d]) for d in sorted(depths)) or '-'))
+    top = sorted(branched.items(), key=lambda item: (-item[1], item[0]))[:5]
+    lines.append('most branched cells: {}'.format(
+        ', '.join('r{}c{} ({})'.format(k // size + 1, k % size + 1, count) for k, count in top) or '-'))
+
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python3 -m app.solver.trace')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help='solve a puzzle and write its trace')
+    record_parser.add_argument('trace', help='path of the trace to write')
+    record_parser.add_argument('file', nargs='?', help='puzzle file (default: stdin), its first puzzle is solved')
+    record_parser.add_argument('--strategy', choices=STRATEGIES, default='mrv',
+                               help='how to pick the cell to branch on (default: mrv)')
+    record_parser.add_argument('--count', type=int, default=1, metavar='LIMIT',
+                               help='search until LIMIT solutions are found (default: 1)')
+
+    summary_parser = commands.add_parser('summary', help='count the events of a trace')
+    summary_parser.add_argument('trace', help='path of the trace')
+
+    replay_parser = commands.add_parser('replay', help='print the events of a trace one by one')
+    replay_parser.add_argument('trace', help='path of the trace')
+    replay_parser.add_argument('--boards', action='store_true',
+                               help='print the board after every search step')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        try:
+            str_puzzle = next(SolverIO.iter_strings(fileinput.input(args.file or '-')), None)
+            if str_puzzle is None:
+                sys.exit('error: no puzzle')
+
+            with open(args.trace, 'wb') as fileout:
+                solver = record(str_puzzle, fileout, args.strategy, args.count)
+        except ValueError as e:
+            sys.exit('error: {}'.format(e))
+
+        print('{} events, {} nodes'.format(solver.observer.events, solver.nodes))
+        return
+
+    with open(args.trace, 'rb') as filein:
+        data = filein.read()
+
+    try:
+        digits, events = read_trace(data)
+
+        if args.command == 'summary':
+            print(summarize(digits, events))
+            return
+
+        replay = Replay(digits)
+        for step, event in enumerate(events, 1):
+            next_choice = replay.apply(event)
+            indent = '  ' * len(replay.paths)
+
+            if next_choice:
+                print('{:>8} {}{}'.format('', indent, replay.choice()))
+
+            print('{:>8} {}{}'.format(step, indent, replay.describe(event)))
+
+            if event[0] == 'path_opened':
+                print('{:>8} {}{}'.format('', indent, replay.choice()))
+
+            if args.boards and (next_choice or event[0] in ('path_opened', 'solution')):
+                print(replay.board() + '\n')
+    except ValueError as e:
+        sys.exit('error: {}'.format(e))
+
+
+if __name__ == '__main__':
+    main()
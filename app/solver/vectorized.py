@@ -0,0 +1,107 @@
+try:
+    import numpy as np
+except ImportError:
+    # optional: only this engine needs it
+    np = None
+
+from .board import box_size
+from .solver import Solver, SolverIO
+from .topology import topology
+
+
+def available():
+    return np is not None
+
+
+class Propagation:
+    # naked and hidden singles over a whole batch of puzzles at once, on a
+    # puzzles x cells x digits tensor that is True where a digit is still possible
+    def __init__(self, size=9):
+        self.size = size
+        self.topology = topology(box_size(size))
+        self.units = np.array(self.topology.units)
+        self.cell_units = np.array(self.topology.cell_units)
+
+    def load(self, str_puzzles):
+        size = self.size
+        digits = np.array(
+            [[SolverIO.char_value(char, size) for char in str_puzzle] for str_puzzle in str_puzzles],
+            dtype=np.int8,
+        ).reshape(len(str_puzzles), size * size)
+
+        candidates = np.ones((len(str_puzzles), size * size, size), dtype=bool)
+        given = digits > 0
+        candidates[given] = np.eye(size, dtype=bool)[digits[given] - 1]
+        return candidates
+
+    def run(self, candidates):
+        # propagates in place until no puzzle changes, returns which puzzles have no solution
+        dead = np.zeros(len(candidates), dtype=bool)
+        # puzzles that changed in the last step, the others are done
+        active = np.arange(len(candidates))
+
+        while active.size:
+            before = candidates[active]
+            after, contradiction = self.step(before)
+            candidates[active] = after
+            dead[active] = contradiction
+
+            changed = (after != before).any(axis=(1, 2))
+            active = active[changed & ~contradiction]
+
+        return dead
+
+    def step(self, candidates):
+        units = self.units
+        cell_units = self.cell_units
+
+        # naked singles: a solved cell removes its digit from all its peers
+        solved = candidates.sum(axis=2) == 1
+        placed = candidates & solved[:, :, None]
+        unit_placed = placed[:, units, :]
+        blocked = unit_placed.any(axis=2)[:, cell_units, :].any(axis=2)
+        candidates = candidates & (~blocked | placed)
+
+        # hidden singles: a digit with one place left in a unit goes there
+        unit_counts = candidates[:, units, :].sum(axis=2)
+        hidden = (unit_counts == 1)[:, cell_units, :].any(axis=2) & candidates
+        hidden_counts = hidden.sum(axis=2)
+        candidates = np.where((hidden_counts > 0)[:, :, None], hidden, candidates)
+
+        contradiction = (
+            (unit_placed.sum(axis=2) > 1).any(axis=(1, 2))
+            | (unit_counts == 0).any(axis=(1, 2))
+            | (hidden_counts > 1).any(axis=1)
+        )
+        return candidates, contradiction
+
+
+def solve_strings(str_puzzles, strategy='mrv', engine='crook'):
+    # same results as stream.solve_string, in input order: (puzzle, solution or None, nodes)
+    results = [None] * len(str_puzzles)
+    by_size = {}
+    for index, str_puzzle in enumerate(str_puzzles):
+        by_size.setdefault(SolverIO.board_size(str_puzzle), []).append(index)
+
+    for size, indices in by_size.items():
+        propagation = Propagation(size)
+        candidates = propagation.load([str_puzzles[index] for index in indices])
+        dead = propagation.run(candidates)
+        solved = candidates.sum(axis=2) == 1
+        digits = (candidates.argmax(axis=2) + 1) * solved
+
+        for i, index in enumerate(indices):
+            str_puzzle = str_puzzles[index]
+
+            if dead[i]:
+                results[index] = str_puzzle, None, 0
+            elif solved[i].all():
+                results[index] = str_puzzle, SolverIO.to_string(digits[i].tolist()), 0
+            else:
+                # only the puzzles left open by propagation go through the search
+                cells = [(k // size, k % size, val) for k, val in enumerate(digits[i].tolist()) if val]
+                solver = Solver(cells, strategy=strategy, size=size, engine=engine)
+                solution = SolverIO.to_string(solver.get_board()) if solver.solve() else None
+                results[index] = str_puzzle, solution, solver.nodes
+
+    return results
@@ -0,0 +1,92 @@
+import json
+import unittest
+
+from aiohttp.test_utils import TestClient, TestServer
+from app.api.aio import create_app
+from app.api.validation import count_error, flag
+from app.api.wsgi import app
+
+PUZZLE = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+HEADERS = {'Content-Type': 'application/json'}
+
+
+class CountErrorTest(unittest.TestCase):
+    def test_limits(self):
+        self.assertIsNone(count_error('1', 10))
+        self.assertIsNone(count_error('10', 10))
+
+        for limit in ('0', '11', '-1', '', 'two', '1.5', '²'):
+            self.assertIsNotNone(count_error(limit, 10), limit)
+
+
+class FlagTest(unittest.TestCase):
+    def test_values(self):
+        for value in ('1', 'true', 'True', 'yes'):
+            self.assertTrue(flag(value), value)
+
+        for value in (None, '', '0', 'false', 'no', 'off'):
+            self.assertFalse(flag(value), value)
+
+
+class WsgiTest(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+
+    def post(self, query=''):
+        return self.client.post('/' + query, data=json.dumps(PUZZLE), headers=HEADERS)
+
+    def test_count_with_a_superscript_digit(self):
+        response = self.post('?count=%C2%B2')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['code'], 400)
+
+    def test_count(self):
+        response = self.post('?count=2')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['count'], 1)
+
+    def test_stats(self):
+        self.assertIn('stats', self.post('?stats=1').get_json())
+        self.assertNotIn('stats', self.post('?stats=0').get_json())
+        self.assertNotIn('stats', self.post('?stats=false').get_json())
+
+    def test_batch_stream(self):
+        body = json.dumps([PUZZLE, PUZZLE])
+        response = self.client.post('/batch?stream=1', data=body, headers=HEADERS)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), 2)
+
+        response = self.client.post('/batch?stream=0', data=body, headers=HEADERS)
+        self.assertEqual(len(response.get_json()['results']), 2)
+
+
+class AioTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = TestClient(TestServer(create_app()))
+        await self.client.start_server()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def post(self, query=''):
+        response = await self.client.post('/' + query, data=json.dumps(PUZZLE), headers=HEADERS)
+        return response.status, await response.json()
+
+    async def test_count_with_a_superscript_digit(self):
+        status, body = await self.post('?count=%C2%B2')
+
+        self.assertEqual(status, 400)
+        self.assertEqual(body['code'], 400)
+
+    async def test_stats(self):
+        status, body = await self.post('?stats=1')
+        self.assertIn('stats', body)
+
+        status, body = await self.post('?stats=0')
+        self.assertNotIn('stats', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
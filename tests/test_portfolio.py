@@ -0,0 +1,26 @@
+import os
+import unittest
+
+from unittest import mock
+from app.solver import portfolio
+from app.solver.benchmark import PUZZLES_DIR
+from app.solver.solver import Solver, SolverIO
+
+
+class PortfolioTest(unittest.TestCase):
+    def test_one_solve_per_puzzle(self):
+        with open(os.path.join(PUZZLES_DIR, 'ai_escargot')) as f:
+            str_puzzle = next(SolverIO.iter_strings(f))
+
+        # start the runs after the first search node
+        with mock.patch.object(portfolio, 'PORTFOLIO_AFTER', 1):
+            solver = Solver(SolverIO.from_string(str_puzzle), portfolio=3)
+            self.assertTrue(solver.solve())
+
+        self.assertIsNotNone(solver.solution)
+        self.assertEqual(solver.stats.solves, 1)
+        self.assertGreater(solver.stats.nodes, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
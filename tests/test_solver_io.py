@@ -0,0 +1,55 @@
+import unittest
+
+from app.solver.solver import SolverIO
+from app.solver.stream import format_result, solve_all
+
+PUZZLE = '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......'
+SOLUTION = '417369825632158947958724316825437169791586432346912758289643571573291684164875293'
+
+
+def rows(str_puzzle):
+    return [str_puzzle[i:i + 9] + '\n' for i in range(0, 81, 9)]
+
+
+class IterStringsTest(unittest.TestCase):
+    def test_rows_and_lines(self):
+        lines = [PUZZLE + '\n', '\n'] + rows(PUZZLE)
+        self.assertEqual(list(SolverIO.iter_strings(lines)), [PUZZLE, PUZZLE])
+
+    def test_incomplete_rows_before_a_puzzle(self):
+        lines = rows(PUZZLE)[:3] + [PUZZLE + '\n']
+        error, puzzle = SolverIO.iter_strings(lines, errors=True)
+
+        self.assertIsInstance(error, ValueError)
+        self.assertEqual(error.args[1], PUZZLE[:27])
+        self.assertEqual(puzzle, PUZZLE)
+
+    def test_short_row_keeps_later_puzzles(self):
+        damaged = rows(PUZZLE)
+        damaged[3] = damaged[3][1:]
+        lines = damaged + rows(PUZZLE) + [PUZZLE + '\n']
+        error, *puzzles = SolverIO.iter_strings(lines, errors=True)
+
+        self.assertIsInstance(error, ValueError)
+        self.assertEqual(error.args[0], 'line 4: expected a row of 9 characters, found 8')
+        self.assertEqual(error.args[1], ''.join(line.strip() for line in damaged))
+        self.assertEqual(puzzles, [PUZZLE, PUZZLE])
+
+    def test_errors_raise_without_errors(self):
+        with self.assertRaises(ValueError):
+            list(SolverIO.iter_strings(rows(PUZZLE)[:3] + [PUZZLE + '\n']))
+
+        with self.assertRaises(ValueError):
+            list(SolverIO.iter_strings(rows(PUZZLE)[:8]))
+
+    def test_stream_solves_puzzles_after_an_error(self):
+        damaged = rows(PUZZLE)
+        damaged[3] = damaged[3][1:]
+        lines = rows(PUZZLE)[:3] + [PUZZLE + '\n'] + damaged + rows(PUZZLE)
+        results = solve_all(SolverIO.iter_strings(lines, errors=True), errors=True)
+
+        self.assertEqual([format_result(result, 'line') for result in results], ['', SOLUTION, '', SOLUTION])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import io
+import os
+import unittest
+
+from app.solver.benchmark import PUZZLES_DIR
+from app.solver.solver import SolverIO
+from app.solver.trace import read_trace, record, summarize
+
+
+class TraceTest(unittest.TestCase):
+    def test_summary_matches_stats(self):
+        with open(os.path.join(PUZZLES_DIR, 'ai_escargot')) as f:
+            str_puzzle = next(SolverIO.iter_strings(f))
+
+        fileout = io.BytesIO()
+        solver = record(str_puzzle, fileout)
+        digits, events = read_trace(fileout.getvalue())
+        summary = summarize(digits, events)
+
+        sizes = ', '.join('{}: {}'.format(size, count) for size, count in sorted(solver.stats.preemptive_sets.items()))
+        self.assertIn('preemptive sets by size: {}\n'.format(sizes), summary)
+        self.assertLessEqual(max(solver.stats.preemptive_sets), solver.max_set_size)
+
+
+if __name__ == '__main__':
+    unittest.main()